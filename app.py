@@ -1,18 +1,125 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for
-from database import (init_db, add_user, add_post, add_comment, add_like,
-                     get_users, get_posts, get_comments, get_likes,
+import math
+import os
+import threading
+
+from flask import Flask, render_template, stream_template, request, redirect, url_for, jsonify
+from markupsafe import Markup
+import backends
+from cache import FragmentCache
+from gateway import Overloaded, RateLimiter
+from profiling import RequestProfiler
+from database import (init_db, start_identity_warmup, get_backend, on_configure, get_recent_posts, add_user, add_post,
+                     submit_like, get_like_buffer_stats, submit_write, get_gateway_stats,
+                     iter_users, iter_posts, iter_comments, iter_likes,
                      get_user_posts, get_post_comments, get_post_likes,
                      get_user_post_counts, get_most_commented_posts, get_top_likers,
+                     DEFAULT_TOP_LIMIT, MAX_TOP_LIMIT,
+                     ANALYTICS_WINDOWS, start_rollup_refresher, rollups_pending, get_user_post_counts_window,
+                     get_most_commented_posts_window, get_top_likers_window,
+                     get_most_commented_posts_approx, get_most_liked_posts_approx,
+                     get_top_likers_approx, get_logs_sample, get_sketch_summary, start_sketch_rebuild,
                      get_logs, delete_inactive_users, delete_old_posts,
                      delete_orphan_comments, delete_orphan_likes, optimize_database,
-                     export_users, export_posts, export_comments, export_likes, export_logs)
+                     export_users, export_posts, export_comments, export_likes, export_logs,
+                     export_delta, get_export_status,
+                     refresh_replica, start_replica_refresher, get_replica_status,
+                     start_backup, get_backups, get_backup_status, get_table_versions,
+                     wait_for_changes, get_consumer_offset, ack_changes,
+                     compact_changelog, get_cdc_status)
 
 app = Flask(__name__)
 
+# Schemat jest sprawdzany przy pierwszym żądaniu, a nie przy imporcie modułu -
+# import app.py w workerach i testach nie otwiera bazy. Dzięki PRAGMA
+# user_version to zwykle jeden odczyt, a użyte połączenie zostaje w puli.
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+@app.before_request
+def _ensure_db():
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_ready_lock:
+        if not _db_ready:
+            init_db()
+            start_identity_warmup()
+            _db_ready = True
+
+DEFAULT_LOG_LIMIT = 50
+
+# Cache wyrenderowanych wierszy tabel na stronach list, kluczowany wersjami
+# tabel (table_versions), od których zależy zawartość strony.
+FRAGMENT_CACHE_BYTES = 32 * 1024 * 1024
+FRAGMENT_CACHE_SPILL_DIR = None
+LIST_PAGE_TABLES = {
+    "users": ("users",),
+    "posts": ("posts", "users"),
+    "comments": ("comments", "users", "posts"),
+    "likes": ("likes", "users", "posts"),
+}
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_BYTES,
+                               FRAGMENT_CACHE_SPILL_DIR and backends.resolve_path(FRAGMENT_CACHE_SPILL_DIR))
+# Wersje tabel innej bazy mogą się pokrywać z zapamiętanymi kluczami
+on_configure(fragment_cache.clear)
+
+# Profilowanie żądań (profiling.py), włączane zmienną środowiskową PROFILING=1;
+# wyniki na /management/perf, profile cProfile wolnych żądań w PROFILE_DIR.
+PROFILING_ENABLED = os.environ.get("PROFILING") == "1"
+PROFILE_DIR = "profiles"
+PROFILE_SLOW_MS = 500
+PROFILE_SAMPLE_RATE = 0.1
+
+profiler = RequestProfiler(backends.resolve_path(PROFILE_DIR), PROFILE_SLOW_MS, PROFILE_SAMPLE_RATE)
+if PROFILING_ENABLED:
+    profiler.install(app)
+
+def _cached_rows(page, rows):
+    # Przy trafieniu oddajemy gotowy HTML; przy chybieniu renderujemy wiersze
+    # strumieniowo i zapisujemy złożony fragment po wyczerpaniu generatora.
+    key = (page, get_table_versions(*LIST_PAGE_TABLES[page]))
+    html = fragment_cache.get(key)
+    if html is not None:
+        yield Markup(html)
+        return
+    chunks = []
+    template = app.jinja_env.get_template(f"partials/{page}_rows.html")
+    for chunk in template.generate(**{page: rows()}):
+        chunks.append(chunk)
+        yield Markup(chunk)
+    fragment_cache.put(key, "".join(chunks))
+
+def _limit_arg(name, default):
+    limit = request.args.get(name, default, type=int)
+    return max(1, min(limit, MAX_TOP_LIMIT))
+
+# Limity zapisów przez bramkę (token bucket): na użytkownika i na adres IP
+USER_WRITE_RATE = 5
+USER_WRITE_BURST = 20
+IP_WRITE_RATE = 50
+IP_WRITE_BURST = 200
+user_write_limiter = RateLimiter(USER_WRITE_RATE, USER_WRITE_BURST)
+ip_write_limiter = RateLimiter(IP_WRITE_RATE, IP_WRITE_BURST)
+
+def _backpressure(status, message, retry_after):
+    return message, status, {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+def _gateway_write(op, user_id, *args):
+    # None = zapisano; w przeciwnym razie odpowiedź 429/503 z Retry-After
+    retry_after = user_write_limiter.check(str(user_id)) or ip_write_limiter.check(request.remote_addr)
+    if retry_after:
+        return _backpressure(429, "Zbyt wiele zapisów - spróbuj ponownie za chwilę.", retry_after)
+    try:
+        submit_write(op, user_id, *args)
+    except Overloaded as e:
+        return _backpressure(503, str(e), e.retry_after)
+    return None
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_template("index.html", recent_posts=get_recent_posts())
 
 @app.route("/users", methods=["GET", "POST"])
 def users():
@@ -22,8 +129,7 @@ def users():
         if username and email:
             add_user(username, email)
         return redirect(url_for("users"))
-    users = get_users()
-    return render_template("users.html", users=users)
+    return stream_template("users.html", rows=_cached_rows("users", iter_users))
 
 @app.route("/posts", methods=["GET", "POST"])
 def posts():
@@ -33,8 +139,7 @@ def posts():
         if user_id and content:
             add_post(user_id, content)
         return redirect(url_for("posts"))
-    posts = get_posts()
-    return render_template("posts.html", posts=posts)
+    return stream_template("posts.html", rows=_cached_rows("posts", iter_posts))
 
 @app.route("/comments", methods=["GET", "POST"])
 def comments():
@@ -43,10 +148,11 @@ def comments():
         post_id = request.form.get("post_id")
         content = request.form.get("content")
         if user_id and post_id and content:
-            add_comment(user_id, post_id, content)
+            rejected = _gateway_write("comment", user_id, post_id, content)
+            if rejected:
+                return rejected
         return redirect(url_for("comments"))
-    comments = get_comments()
-    return render_template("comments.html", comments=comments)
+    return stream_template("comments.html", rows=_cached_rows("comments", iter_comments))
 
 @app.route("/likes", methods=["GET", "POST"])
 def likes():
@@ -54,21 +160,99 @@ def likes():
         user_id = request.form.get("user_id")
         post_id = request.form.get("post_id")
         if user_id and post_id:
-            add_like(user_id, post_id)
+            op = "unlike" if request.form.get("action") == "unlike" else "like"
+            rejected = _gateway_write(op, user_id, post_id)
+            if rejected:
+                return rejected
         return redirect(url_for("likes"))
-    likes = get_likes()
-    return render_template("likes.html", likes=likes)
+    return stream_template("likes.html", rows=_cached_rows("likes", iter_likes))
+
+@app.route("/likes/batch", methods=["POST"])
+def likes_batch():
+    # {"likes": [[user_id, post_id], ...], "unlikes": [[user_id, post_id], ...]}
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify(error="Oczekiwano obiektu JSON z listami likes/unlikes"), 400
+    # Najpierw walidacja całej paczki - błędna para nie może zostawić
+    # częściowo przyjętych zmian
+    try:
+        changes = [(int(user_id), int(post_id), True) for user_id, post_id in payload.get("likes", [])]
+        changes += [(int(user_id), int(post_id), False) for user_id, post_id in payload.get("unlikes", [])]
+    except (TypeError, ValueError):
+        return jsonify(error="Oczekiwano list par [user_id, post_id]"), 400
+    for user_id, post_id, liked in changes:
+        submit_like(user_id, post_id, liked)
+    return jsonify(accepted=len(changes), buffer=get_like_buffer_stats()), 202
+
+@app.route("/changes")
+def changes():
+    # ?since=<seq> lub ?consumer=<nazwa> (start od potwierdzonego seq),
+    # ?limit=<N>, ?timeout=<s> - long-polling, gdy brak nowych zmian
+    consumer = request.args.get("consumer")
+    since = request.args.get("since", type=int)
+    if since is None:
+        since = get_consumer_offset(consumer) if consumer else 0
+    limit = request.args.get("limit", 100, type=int)
+    timeout = request.args.get("timeout", 0, type=float)
+    batch = wait_for_changes(since, limit, timeout)
+    next_since = batch[-1]["seq"] if batch else since
+    return jsonify(changes=batch, next_since=next_since)
+
+@app.route("/changes/ack", methods=["POST"])
+def changes_ack():
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify(error="Wymagane pola: consumer, seq"), 400
+    consumer = payload.get("consumer")
+    try:
+        seq = int(payload.get("seq"))
+    except (TypeError, ValueError):
+        seq = None
+    if not consumer or not isinstance(consumer, str) or seq is None:
+        return jsonify(error="Wymagane pola: consumer, seq"), 400
+    ack_changes(consumer, seq)
+    return jsonify(consumer=consumer, seq=seq)
 
 @app.route("/analytics")
 def analytics():
-    user_post_counts = get_user_post_counts()
-    most_commented_posts = get_most_commented_posts()
-    top_likers = get_top_likers()
-    logs = get_logs()
+    window = request.args.get("window", "all")
+    mode = request.args.get("mode", "exact")
+    limit = _limit_arg("limit", DEFAULT_TOP_LIMIT)
+    log_limit = _limit_arg("log_limit", DEFAULT_LOG_LIMIT)
+    if mode == "approx":
+        window = "all"
+        return render_template("analytics.html",
+                              window=window,
+                              mode=mode,
+                              limit=limit,
+                              log_limit=log_limit,
+                              user_post_counts=get_user_post_counts(limit),
+                              most_commented_posts=get_most_commented_posts_approx(limit),
+                              most_liked_posts=get_most_liked_posts_approx(limit),
+                              top_likers=get_top_likers_approx(limit),
+                              logs=get_logs_sample(log_limit),
+                              sketch_summary=get_sketch_summary())
+    mode = "exact"
+    if window in ANALYTICS_WINDOWS:
+        start_rollup_refresher()
+        user_post_counts = get_user_post_counts_window(window, limit)
+        most_commented_posts = get_most_commented_posts_window(window, limit)
+        top_likers = get_top_likers_window(window, limit)
+    else:
+        window = "all"
+        user_post_counts = get_user_post_counts(limit)
+        most_commented_posts = get_most_commented_posts(limit)
+        top_likers = get_top_likers(limit)
+    logs = get_logs(log_limit)
     return render_template("analytics.html",
+                          window=window,
+                          mode=mode,
+                          limit=limit,
+                          log_limit=log_limit,
                           user_post_counts=user_post_counts,
                           most_commented_posts=most_commented_posts,
                           top_likers=top_likers,
+                          rollups_pending=window != "all" and rollups_pending(),
                           logs=logs)
 
 @app.route("/management", methods=["GET", "POST"])
@@ -85,6 +269,14 @@ def management():
             delete_orphan_likes()
         elif action == "optimize_database":
             optimize_database()
+        elif action == "backup_database":
+            start_backup()
+        elif action == "compact_changelog":
+            compact_changelog()
+        elif action == "refresh_replica":
+            refresh_replica()
+        elif action == "rebuild_sketches":
+            start_sketch_rebuild()
         elif action == "export_users":
             export_users()
         elif action == "export_posts":
@@ -95,10 +287,36 @@ def management():
             export_likes()
         elif action == "export_logs":
             export_logs()
+        elif action == "export_delta":
+            export_delta()
         return redirect(url_for("management"))
-    return render_template("management.html")
+    return render_template("management.html",
+                          replica_status=get_replica_status(),
+                          backups=get_backups(),
+                          backup_status=get_backup_status(),
+                          fragment_cache_stats=fragment_cache.stats(),
+                          cdc_status=get_cdc_status(),
+                          backend=get_backend().describe(),
+                          gateway_stats=get_gateway_stats(),
+                          rate_limited=user_write_limiter.limited + ip_write_limiter.limited,
+                          export_status=get_export_status())
 
-init_db()
+@app.route("/management/perf", methods=["GET", "POST"])
+def perf():
+    if request.method == "POST":
+        if request.form.get("action") == "reset":
+            profiler.reset()
+        return redirect(url_for("perf"))
+    return render_template("perf.html",
+                          enabled=profiler.enabled,
+                          routes=profiler.stats(),
+                          profiles=profiler.profiles(),
+                          slow_ms=profiler.slow_ms,
+                          sample_rate=profiler.sample_rate)
 
 if __name__ == "__main__":
+    # Schemat (init_db) musi istnieć, zanim wątki w tle zaczną z niego czytać
+    _ensure_db()
+    start_replica_refresher()
+    start_rollup_refresher()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,222 @@
+# backends.py
+# Silniki przechowywania za API z database.py, wybierane przez DSN:
+#   sqlite:///database.sqlite       plik (ścieżka względna liczona od katalogu
+#   sqlite:////abs/path.sqlite      projektu, nie od bieżącego katalogu)
+#   memory://nazwa                  baza w pamięci współdzielona przez połączenia
+#                                   procesu (VFS memdb)
+#   hybrid:///database.sqlite?hot=500
+#                                   plik + najnowsze posty w pamięci, zapisywane
+#                                   najpierw na dysk, potem do pamięci
+# Parametr ?timeout=<s> ustawia busy_timeout połączeń (domyślnie BUSY_TIMEOUT).
+import os
+import sqlite3
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Jak długo zapis czeka na blokadę innego połączenia, zanim zgłosi
+# "database is locked" (PRAGMA busy_timeout)
+BUSY_TIMEOUT = 5.0
+
+# Ile bezczynnych połączeń backend trzyma do ponownego użycia. Otwarcie
+# połączenia i parsowanie schematu (kilkadziesiąt triggerów) przy pierwszym
+# zapytaniu kosztuje setki mikrosekund - więcej niż typowe zapytanie.
+POOL_SIZE = 8
+
+def resolve_path(path):
+    return path if os.path.isabs(path) else os.path.join(PROJECT_DIR, path)
+
+class PooledConnection(sqlite3.Connection):
+    # close() oddaje połączenie do puli backendu zamiast je zamykać
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+class ConnectionPool:
+    # Połączenia są używane przez jeden wątek naraz, ale mogą przechodzić
+    # między wątkami (serwer deweloperski tworzy wątek na żądanie), stąd
+    # check_same_thread=False. Przy zwrocie cofamy niezatwierdzoną transakcję
+    # i wyłączamy foreign_keys, żeby kolejny użytkownik dostał połączenie
+    # w takim stanie, jak świeżo otwarte.
+    def __init__(self, open_connection, size=POOL_SIZE):
+        self.open_connection = open_connection
+        self.size = size
+        self.closed = False
+        self.reused = 0
+        self.opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, factory):
+        with self._lock:
+            for index in range(len(self._idle) - 1, -1, -1):
+                if type(self._idle[index]) is factory:
+                    self.reused += 1
+                    return self._idle.pop(index)
+            self.opened += 1
+        conn = self.open_connection(factory)
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute("PRAGMA foreign_keys = OFF")
+            conn.row_factory = None
+        except sqlite3.Error:
+            return False
+        with self._lock:
+            if self.closed or len(self._idle) >= self.size:
+                return False
+            self._idle.append(conn)
+            return True
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+class FileBackend:
+    kind = "file"
+    hot = None
+
+    def __init__(self, path, timeout=BUSY_TIMEOUT):
+        self.path = resolve_path(path)
+        self.timeout = timeout
+        self.pool = ConnectionPool(self._open)
+
+    def _open(self, factory):
+        return sqlite3.connect(self.path, timeout=self.timeout, factory=factory, check_same_thread=False)
+
+    def connect(self, factory=PooledConnection):
+        if issubclass(factory, PooledConnection):
+            return self.pool.acquire(factory)
+        return sqlite3.connect(self.path, timeout=self.timeout, factory=factory)
+
+    def close(self):
+        self.pool.close()
+
+    def describe(self):
+        return f"plik {self.path}"
+
+class MemoryBackend:
+    kind = "memory"
+    path = None
+    hot = None
+
+    def __init__(self, name="database", timeout=BUSY_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        # VFS memdb zamiast cache=shared: współdzielony cache blokuje na poziomie
+        # tabel i zwraca SQLITE_LOCKED, na którym busy_timeout nie czeka -
+        # memdb używa zwykłych blokad bazy, więc zapisy czekają jak przy pliku
+        self.uri = f"file:/{name}?vfs=memdb"
+        # Baza w pamięci istnieje, dopóki jest otwarte choć jedno połączenie
+        self._anchor = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self.pool = ConnectionPool(self._open)
+
+    def _open(self, factory):
+        return sqlite3.connect(self.uri, uri=True, timeout=self.timeout, factory=factory, check_same_thread=False)
+
+    def connect(self, factory=PooledConnection):
+        if issubclass(factory, PooledConnection):
+            return self.pool.acquire(factory)
+        return sqlite3.connect(self.uri, uri=True, timeout=self.timeout, factory=factory)
+
+    def close(self):
+        self.pool.close()
+        self._anchor.close()
+
+    def describe(self):
+        return f"pamięć ({self.name})"
+
+class HotPosts:
+    # Najnowsze `capacity` postów (z nazwą autora) w prywatnej bazie w pamięci.
+    # Zakłada jeden proces zapisujący - zapisy innych procesów nie są widoczne
+    # do najbliższego przeładowania (warm).
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.warm = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE hot_posts (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX idx_hot_posts_created_at ON hot_posts(created_at DESC, id DESC)")
+
+    def load(self, rows):
+        with self._lock:
+            self._conn.execute("DELETE FROM hot_posts")
+            self._conn.executemany("INSERT INTO hot_posts VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self.warm = True
+
+    def add(self, row):
+        with self._lock:
+            if not self.warm:
+                return
+            self._conn.execute("INSERT OR REPLACE INTO hot_posts VALUES (?, ?, ?, ?)", row)
+            self._conn.execute("""
+            DELETE FROM hot_posts WHERE id NOT IN (
+                SELECT id FROM hot_posts ORDER BY created_at DESC, id DESC LIMIT ?
+            )
+            """, (self.capacity,))
+            self._conn.commit()
+
+    def invalidate(self):
+        with self._lock:
+            self.warm = False
+            self._conn.execute("DELETE FROM hot_posts")
+            self._conn.commit()
+
+    def recent(self, limit):
+        # None = nie da się odpowiedzieć z pamięci, trzeba czytać z dysku
+        with self._lock:
+            if not self.warm or limit > self.capacity:
+                return None
+            return self._conn.execute("""
+            SELECT id, username, content, created_at FROM hot_posts
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+            """, (limit,)).fetchall()
+
+class HybridBackend(FileBackend):
+    kind = "hybrid"
+
+    def __init__(self, path, hot_posts=500, timeout=BUSY_TIMEOUT):
+        super().__init__(path, timeout)
+        self.hot = HotPosts(hot_posts)
+
+    def describe(self):
+        return f"plik {self.path} + {self.hot.capacity} najnowszych postów w pamięci"
+
+def from_url(url):
+    if "://" not in url:
+        return FileBackend(url)
+    parts = urlsplit(url)
+    # Jak w SQLAlchemy: sqlite:///względna.sqlite, sqlite:////bezwzględna.sqlite
+    path = parts.path[1:] if parts.path.startswith("/") else parts.path
+    params = parse_qs(parts.query)
+    timeout = float(params.get("timeout", [BUSY_TIMEOUT])[0])
+    if parts.scheme in ("sqlite", "file"):
+        return FileBackend(path, timeout)
+    if parts.scheme == "memory":
+        return MemoryBackend(parts.netloc or path or "database", timeout)
+    if parts.scheme == "hybrid":
+        return HybridBackend(path, int(params.get("hot", ["500"])[0]), timeout)
+    raise ValueError(f"Nieobsługiwany DSN bazy danych: {url}")
@@ -0,0 +1,152 @@
+# backup.py
+# Kopie zapasowe "na gorąco": online backup API w krokach po `pages` stron
+# (zapisujący nie są blokowani dłużej niż na jeden krok), weryfikacja przez
+# PRAGMA integrity_check, kompresja gzip i rotacja starych kopii.
+#
+# Użycie:
+#   python backup.py                     # nowa kopia w katalogu backups/
+#   python backup.py --keep 14 --pages 128 --sleep 0.01
+#   python backup.py --list
+#   python backup.py --restore backups/database-20250223-204901.sqlite.gz --target restored.sqlite
+#
+# Przed odtworzeniem kopii zatrzymaj aplikację.
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from replica import paced_copy
+
+BACKUP_PREFIX = "database-"
+BACKUP_SUFFIX = ".sqlite.gz"
+
+def _new_backup_path(backup_dir):
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}{BACKUP_SUFFIX}")
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}-{counter}{BACKUP_SUFFIX}")
+        counter += 1
+    return path
+
+def verify_database(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    if result != [("ok",)]:
+        raise sqlite3.DatabaseError(f"Kopia {path} nie przeszła integrity_check: {result[:5]}")
+
+def list_backups(backup_dir):
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX):
+            path = os.path.join(backup_dir, name)
+            backups.append({"name": name, "path": path, "size": os.path.getsize(path),
+                            "mtime": os.path.getmtime(path)})
+    backups.sort(key=lambda item: item["mtime"], reverse=True)
+    for item in backups:
+        item["created_at"] = datetime.fromtimestamp(item.pop("mtime"))
+    return backups
+
+def rotate_backups(backup_dir, keep):
+    removed = []
+    for old in list_backups(backup_dir)[keep:]:
+        os.remove(old["path"])
+        removed.append(old["name"])
+    return removed
+
+def create_backup(db_path, backup_dir, keep=7, pages=256, sleep=0.005):
+    os.makedirs(backup_dir, exist_ok=True)
+    archive = _new_backup_path(backup_dir)
+    raw = archive[:-len(".gz")]
+    started = time.perf_counter()
+    try:
+        paced_copy(db_path, raw, pages, sleep)
+        copied = time.perf_counter()
+        verify_database(raw)
+        verified = time.perf_counter()
+        with open(raw, "rb") as src, gzip.open(archive, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        size = os.path.getsize(raw)
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+    finished = time.perf_counter()
+    copy_seconds = copied - started
+    return {
+        "path": archive,
+        "size": size,
+        "compressed_size": os.path.getsize(archive),
+        "copy_seconds": copy_seconds,
+        "verify_seconds": verified - copied,
+        "total_seconds": finished - started,
+        "throughput_mb_s": size / (1024 * 1024) / copy_seconds if copy_seconds else None,
+        "rotated": rotate_backups(backup_dir, keep),
+    }
+
+def restore_backup(archive, target):
+    # Aplikacja musi być zatrzymana: otwarte połączenia i jej pamięci podręczne
+    # nie wiedzą o podmianie bazy. Istniejącą bazę nadpisujemy przez backup API
+    # zamiast podmiany pliku - pozostawione -wal/-shm nie zostaną wtedy
+    # odtworzone na wierzch przywróconej kopii.
+    tmp = target + ".restore"
+    try:
+        with gzip.open(archive, "rb") as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        verify_database(tmp)
+        if not os.path.exists(target):
+            # Osierocone -wal/-shm bez pliku bazy pasowałyby do innej zawartości
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+            os.replace(tmp, target)
+            return
+        src = sqlite3.connect(tmp)
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def main():
+    parser = argparse.ArgumentParser(description="Kopie zapasowe bazy danych na gorąco")
+    parser.add_argument("--db", default="database.sqlite", help="ścieżka do bazy")
+    parser.add_argument("--dir", default="backups", help="katalog kopii zapasowych")
+    parser.add_argument("--keep", type=int, default=7, help="ile najnowszych kopii zachować")
+    parser.add_argument("--pages", type=int, default=256, help="liczba stron kopiowanych w jednym kroku")
+    parser.add_argument("--sleep", type=float, default=0.005, help="przerwa między krokami [s]")
+    parser.add_argument("--list", action="store_true", help="wypisz istniejące kopie")
+    parser.add_argument("--restore", metavar="ARCHIWUM", help="odtwórz bazę z kopii")
+    parser.add_argument("--target", help="plik docelowy odtwarzanej bazy")
+    args = parser.parse_args()
+
+    if args.list:
+        for item in list_backups(args.dir):
+            print(f"{item['name']}  {item['size'] / 1024:.1f} KiB  {item['created_at']:%Y-%m-%d %H:%M:%S}")
+        return
+    if args.restore:
+        target = args.target or args.db
+        restore_backup(args.restore, target)
+        print(f"✅ Odtworzono {target} z {args.restore}")
+        return
+    result = create_backup(args.db, args.dir, args.keep, args.pages, args.sleep)
+    print(f"💾 Utworzono kopię {result['path']}")
+    print(f"   rozmiar: {result['size'] / 1024:.1f} KiB -> {result['compressed_size'] / 1024:.1f} KiB po kompresji")
+    print(f"   kopiowanie: {result['copy_seconds']:.3f} s ({result['throughput_mb_s'] or 0:.1f} MB/s), "
+          f"weryfikacja: {result['verify_seconds']:.3f} s, razem: {result['total_seconds']:.3f} s")
+    if result["rotated"]:
+        print(f"🗑 Usunięto stare kopie: {', '.join(result['rotated'])}")
+
+if __name__ == "__main__":
+    main()
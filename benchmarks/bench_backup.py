@@ -0,0 +1,94 @@
+# benchmarks/bench_backup.py
+# Przepustowość kopii zapasowej i jej wpływ na opóźnienia równoległych zapisów.
+# Wątek zapisujący dodaje komentarze przez cały czas trwania pomiaru; mierzymy
+# p50/p99/max opóźnienia zapisu bez kopii oraz w trakcie kopii z różnym
+# rozmiarem kroku (pages).
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_backup --rows 200000 --pages 64 256 -1
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import backup
+import database
+
+def populate(path, rows, rng):
+    database.configure("sqlite:///" + path)
+    database.init_db()
+    conn = sqlite3.connect(path)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO users (username, email) VALUES (?, ?)",
+                     ((f"user{i}", f"user{i}@example.com") for i in range(1000)))
+    conn.executemany("INSERT INTO posts (user_id, content) VALUES (?, ?)",
+                     ((rng.randint(1, 1000), "x" * 200) for _ in range(rows)))
+    conn.commit()
+    conn.close()
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def writer(path, stop, latencies):
+    conn = sqlite3.connect(path, timeout=30)
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("INSERT INTO comments (user_id, post_id, content) VALUES (1, 1, 'bench')")
+        conn.commit()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.001)
+    conn.close()
+
+def measure(path, duration, action=None):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=writer, args=(path, stop, latencies))
+    thread.start()
+    result = None
+    if action is None:
+        time.sleep(duration)
+    else:
+        result = action()
+    stop.set()
+    thread.join()
+    return latencies, result
+
+def report(label, latencies, extra=""):
+    print(f"{label:<22} | {len(latencies):>7} | {statistics.median(latencies):>8.2f} | "
+          f"{percentile(latencies, 0.99):>8.2f} | {max(latencies):>8.2f} | {extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kopii zapasowej na gorąco")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[64, 256, -1])
+    parser.add_argument("--sleep", type=float, default=0.005)
+    parser.add_argument("--baseline", type=float, default=2.0, help="czas pomiaru bez kopii [s]")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite")
+        populate(path, args.rows, random.Random(args.seed))
+        print(f"Baza: {os.path.getsize(path) / (1024 * 1024):.1f} MiB")
+        print(f"{'scenariusz':<22} | {'zapisy':>7} | {'p50 [ms]':>8} | {'p99 [ms]':>8} | {'max [ms]':>8} | kopia")
+        print("-" * 100)
+        latencies, _ = measure(path, args.baseline)
+        report("bez kopii", latencies)
+        for pages in args.pages:
+            backup_dir = os.path.join(tmp, f"backups_{pages}")
+            sleep = args.sleep if pages > 0 else 0
+            latencies, result = measure(
+                path, None, lambda: backup.create_backup(path, backup_dir, 1, pages, sleep))
+            report(f"kopia pages={pages}", latencies,
+                   f"{result['copy_seconds']:.2f} s, {result['throughput_mb_s']:.1f} MB/s, "
+                   f"razem {result['total_seconds']:.2f} s")
+
+if __name__ == "__main__":
+    main()
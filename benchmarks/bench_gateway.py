@@ -0,0 +1,100 @@
+# benchmarks/bench_gateway.py
+# Burst zapisów (komentarze i polubienia jednego "viralowego" postu) z wielu
+# wątków naraz: każdy zapis jako osobna transakcja (add_comment/add_like)
+# vs. bramka zapisów z group commit (submit_write).
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_gateway --threads 32 --writes 50
+#   python -m benchmarks.bench_gateway --busy-timeout 0.05   # krótki busy_timeout
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+
+import database
+
+def populate(users):
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO users (username, email) VALUES (?, ?)",
+                     ((f"user{i}", f"user{i}@example.com") for i in range(users)))
+    conn.execute("INSERT INTO posts (user_id, content) VALUES (1, 'viral')")
+    conn.commit()
+    conn.close()
+
+def burst(write, threads, writes, users, seed):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = []
+        barrier.wait()
+        for i in range(writes):
+            user_id = rng.randint(1, users)
+            start = time.perf_counter()
+            write("comment" if i % 2 else "like", user_id)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    output = io.StringIO()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    errors = sum(1 for line in output.getvalue().splitlines() if line.startswith("⚠"))
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], \
+        latencies[int(len(latencies) * 0.99) - 1], latencies[-1], errors
+
+def direct(op, user_id):
+    try:
+        if op == "comment":
+            database.add_comment(user_id, 1, "burst")
+        else:
+            database.add_like(user_id, 1)
+    except Exception as e:
+        print(f"⚠ {e}")
+
+def gateway(op, user_id):
+    try:
+        if op == "comment":
+            database.submit_write("comment", user_id, 1, "burst")
+        else:
+            database.submit_write("like", user_id, 1)
+    except Exception as e:
+        print(f"⚠ {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bramki zapisów przy burstach")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50, help="Zapisów na wątek")
+    parser.add_argument("--busy-timeout", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database.SKETCHES_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}?timeout={args.busy_timeout}")
+        populate(args.users)
+        print(f"{'wariant':<14} | {'zapisy/s':>9} | {'p50 [ms]':>9} | {'p99 [ms]':>9} | {'max [ms]':>9} | {'błędy':>6}")
+        print("-" * 72)
+        for label, write in (("bezpośrednio", direct), ("bramka", gateway)):
+            rate, p50, p99, worst, errors = burst(write, args.threads, args.writes, args.users, args.seed)
+            print(f"{label:<14} | {rate:>9.0f} | {p50:>9.2f} | {p99:>9.2f} | {worst:>9.2f} | {errors:>6}")
+        print(f"Bramka: {database.get_gateway_stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_sharding.py
+# Przepustowość zapisów (add_post + add_comment) przy 1-8 shardach. Wątki
+# piszą równolegle dla losowych użytkowników; przy jednym shardzie wszystkie
+# czekają na tę samą blokadę zapisu, przy N shardach blokad jest N.
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_sharding --users 400 --writers 8 --writes 200
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from sharding import ShardedStore
+
+SHARD_COUNTS = (1, 2, 4, 8)
+
+def populate(store, users):
+    user_ids = [store.add_user(f"user{i}", f"user{i}@example.com") for i in range(users)]
+    post_ids = [store.add_post(user_id, "seed") for user_id in user_ids]
+    return user_ids, post_ids
+
+def writer(store, user_ids, post_ids, writes, seed, latencies, errors):
+    rng = random.Random(seed)
+    local = []
+    for i in range(writes):
+        start = time.perf_counter()
+        try:
+            if i % 2:
+                store.add_post(rng.choice(user_ids), "bench")
+            else:
+                store.add_comment(rng.choice(user_ids), rng.choice(post_ids), "bench")
+        except Exception:
+            errors.append(1)
+        local.append((time.perf_counter() - start) * 1000)
+    latencies.extend(local)
+
+def run(shards, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ShardedStore(tmp, shards)
+        user_ids, post_ids = populate(store, args.users)
+        latencies, errors, threads = [], [], []
+        for w in range(args.writers):
+            threads.append(threading.Thread(target=writer, args=(
+                store, user_ids, post_ids, args.writes, args.seed + w, latencies, errors)))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        store._pool.shutdown()
+    latencies.sort()
+    total = args.writers * args.writes
+    print(f"{shards:>6} | {total / elapsed:>10.0f} | {latencies[len(latencies) // 2]:>8.2f} | "
+          f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f} | {len(errors):>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zapisów przy różnej liczbie shardów")
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="Zapisów na wątek")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'shardy':>6} | {'zapisy/s':>10} | {'p50 [ms]':>8} | {'p99 [ms]':>8} | {'błędy':>6}")
+    print("-" * 50)
+    for shards in SHARD_COUNTS:
+        run(shards, args)
+
+if __name__ == "__main__":
+    main()
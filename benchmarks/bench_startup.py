@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+# Zimny start: czas od uruchomienia interpretera przez import app.py do
+# pierwszej odpowiedzi GET /, każdy pomiar w nowym procesie.
+#   eager - dawna ścieżka: pełne CREATE ... IF NOT EXISTS przy imporcie,
+#           rozgrzanie cache id, wczesny import backup/delta_export/sharding
+#           i nowe połączenie do bazy przy każdym wywołaniu
+#   lazy  - obecna ścieżka: schemat sprawdzany przez PRAGMA user_version przy
+#           pierwszym żądaniu, leniwe importy, połączenia z puli
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_startup --runs 10 --users 10000 --posts 100000
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sqlite3, sys, time
+start = time.perf_counter()
+eager = sys.argv[1] == "eager"
+if eager:
+    import backup, delta_export, sharding
+import app
+import database
+imported = time.perf_counter()
+if eager:
+    conn = sqlite3.connect(database.get_backend().path)
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+    database.CONNECTION_FACTORY = sqlite3.Connection
+    database.init_db()
+    database.warm_identity_cache()
+ready = time.perf_counter()
+with app.app.test_client() as client:
+    response = client.get("/")
+    response.close()
+    assert response.status_code == 200, response.status_code
+    first = time.perf_counter()
+    response = client.get("/users")
+    response.get_data()
+    response.close()
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "init": ready - imported,
+                  "first": first - ready, "second": done - first}))
+"""
+
+def measure(variant, url):
+    env = dict(os.environ, DATABASE_URL=url, PYTHONPATH=PROJECT_DIR)
+    output = subprocess.run([sys.executable, "-c", CHILD, variant], env=env, cwd=PROJECT_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zimnego startu aplikacji")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}"
+        subprocess.run([sys.executable, os.path.join(PROJECT_DIR, "db_setup.py"), "--url", url,
+                        "--users", str(args.users), "--posts", str(args.posts)],
+                       cwd=PROJECT_DIR, capture_output=True, check=True)
+        print(f"{'wariant':<8} | {'import [ms]':>11} | {'init [ms]':>9} | {'1. GET / [ms]':>13} | "
+              f"{'GET /users [ms]':>15} | {'razem [ms]':>10}")
+        print("-" * 82)
+        for variant in ("eager", "lazy"):
+            samples = [measure(variant, url) for _ in range(args.runs)]
+            median = {key: statistics.median(sample[key] for sample in samples) * 1000 for key in samples[0]}
+            total = median["import"] + median["init"] + median["first"]
+            print(f"{variant:<8} | {median['import']:>11.1f} | {median['init']:>9.1f} | {median['first']:>13.1f} | "
+                  f"{median['second']:>15.1f} | {total:>10.1f}")
+
+if __name__ == "__main__":
+    main()
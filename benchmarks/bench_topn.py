@@ -0,0 +1,93 @@
+# benchmarks/bench_topn.py
+# Porównanie rankingów top-N: pełna agregacja (stare zapytania) vs. liczniki
+# utrzymywane przez triggery + przejście po indeksie z LIMIT.
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_topn --sizes 10000 100000 1000000 --limit 10
+#   python -m benchmarks.bench_topn --memory   # baza w pamięci zamiast pliku
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import database
+
+FULL_SCAN_QUERIES = {
+    "most_commented_posts": """
+    SELECT posts.id, posts.content, users.username, COUNT(comments.id) AS comment_count
+    FROM posts
+    JOIN users ON posts.user_id = users.id
+    LEFT JOIN comments ON posts.id = comments.post_id
+    GROUP BY posts.id
+    HAVING comment_count > 0
+    ORDER BY comment_count DESC
+    """,
+    "top_likers": """
+    SELECT users.username, COUNT(likes.id) AS like_count
+    FROM users
+    JOIN likes ON users.id = likes.user_id
+    GROUP BY users.id
+    HAVING like_count > 0
+    ORDER BY like_count DESC
+    """,
+}
+
+def populate(url, size, rng):
+    database.configure(url)
+    database.init_db()
+    n_users = max(10, size // 100)
+    n_posts = max(10, size // 10)
+    conn = database.get_db_connection()
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO users (username, email) VALUES (?, ?)",
+                     ((f"user{i}", f"user{i}@example.com") for i in range(n_users)))
+    conn.executemany("INSERT INTO posts (user_id, content) VALUES (?, ?)",
+                     ((rng.randint(1, n_users), f"post {i}") for i in range(n_posts)))
+    conn.executemany("INSERT INTO comments (user_id, post_id, content) VALUES (?, ?, ?)",
+                     ((rng.randint(1, n_users), rng.randint(1, n_posts), "c") for _ in range(size)))
+    conn.executemany("INSERT OR IGNORE INTO likes (user_id, post_id) VALUES (?, ?)",
+                     ((rng.randint(1, n_users), rng.randint(1, n_posts)) for _ in range(size)))
+    conn.commit()
+    conn.close()
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rankingów top-N")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=database.DEFAULT_TOP_LIMIT)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="Baza w pamięci (memory://)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'wiersze':>10} | {'zapytanie':<22} | {'pełny skan [ms]':>16} | {'top-N [ms]':>11}")
+    print("-" * 70)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            if args.memory:
+                url = f"memory://bench_{size}"
+            else:
+                url = "sqlite:///" + os.path.join(tmp, f"bench_{size}.sqlite")
+            populate(url, size, rng)
+            conn = database.get_db_connection()
+            top_n = {
+                "most_commented_posts": lambda: database.get_most_commented_posts(args.limit),
+                "top_likers": lambda: database.get_top_likers(args.limit),
+            }
+            for name, query in FULL_SCAN_QUERIES.items():
+                full_ms = timed(lambda: conn.execute(query).fetchall(), args.repeat)
+                top_ms = timed(top_n[name], args.repeat)
+                print(f"{size:>10} | {name:<22} | {full_ms:>16.2f} | {top_ms:>11.2f}")
+            conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_write_path.py
+# Ścieżka zapisu add_post/add_comment z cache istnienia id i bez niego.
+# Z cache trafienie pomija SELECT sprawdzający istnienie użytkownika/postu.
+#
+# Uruchomienie z katalogu projektu:
+#   python -m benchmarks.bench_write_path --users 10000 --posts 100000 --writes 2000
+#   python -m benchmarks.bench_write_path --memory   # baza w pamięci zamiast pliku
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import database
+
+def populate(url, users, posts, rng):
+    database.configure(url)
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO users (username, email) VALUES (?, ?)",
+                     ((f"user{i}", f"user{i}@example.com") for i in range(users)))
+    conn.executemany("INSERT INTO posts (user_id, content) VALUES (?, ?)",
+                     ((rng.randint(1, users), f"post {i}") for i in range(posts)))
+    conn.commit()
+    conn.close()
+
+def run(label, writes, users, posts, rng):
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(writes):
+            user_id = rng.randint(1, users)
+            start = time.perf_counter()
+            if i % 2:
+                database.add_post(user_id, "bench")
+            else:
+                database.add_comment(user_id, rng.randint(1, posts), "bench")
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"{label:<14} | {writes / (sum(latencies) / 1000):>10.0f} | {statistics.median(latencies):>8.3f} | "
+          f"{latencies[int(len(latencies) * 0.99) - 1]:>8.3f}")
+
+def run_checks(label, checks, users, posts, rng):
+    # Sam koszt weryfikacji istnienia, bez INSERT i commit
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for _ in range(checks):
+        database._user_exists(cursor, rng.randint(1, users))
+        database._post_exists(cursor, rng.randint(1, posts))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    print(f"{label:<14} | {checks / elapsed:>12.0f} | {elapsed / checks * 1_000_000:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ścieżki zapisu z cache istnienia id")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=2_000)
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="Baza w pamięci (memory://)")
+    args = parser.parse_args()
+
+    database.SKETCHES_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "memory://bench" if args.memory else "sqlite:///" + os.path.join(tmp, "bench.sqlite")
+        populate(url, args.users, args.posts, random.Random(args.seed))
+        start = time.perf_counter()
+        database.warm_identity_cache()
+        print(f"Rozgrzewanie cache: {(time.perf_counter() - start) * 1000:.1f} ms, "
+              f"{database.get_identity_cache_stats()}")
+        print(f"{'wariant':<14} | {'zapisy/s':>10} | {'p50 [ms]':>8} | {'p99 [ms]':>8}")
+        print("-" * 50)
+        for enabled in (False, True, False, True):
+            database.IDENTITY_CACHE_ENABLED = enabled
+            run("z cache" if enabled else "bez cache", args.writes, args.users, args.posts,
+                random.Random(args.seed))
+        print()
+        print(f"{'wariant':<14} | {'sprawdzeń/s':>12} | {'µs/zapis':>10}")
+        print("-" * 42)
+        for enabled in (False, True):
+            database.IDENTITY_CACHE_ENABLED = enabled
+            run_checks("z cache" if enabled else "bez cache", args.checks, args.users, args.posts,
+                       random.Random(args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# cache.py
+# Cache wyrenderowanych fragmentów HTML z ewikcją LRU i limitem rozmiaru
+# w bajtach. Wypchnięte z pamięci wpisy mogą trafiać na dysk (spill_dir)
+# i wracać do pamięci przy kolejnym trafieniu.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+class FragmentCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, spill_dir=None, spill_max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.size = 0
+        self.spill_size = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._spilled = OrderedDict()
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.html")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            path, size = spilled
+            try:
+                with open(path, encoding="utf-8") as file:
+                    value = file.read()
+                os.remove(path)
+            except OSError:
+                value = None
+            with self._lock:
+                self.spill_size -= size
+                if value is not None:
+                    self.spill_hits += 1
+            if value is not None:
+                self.put(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                old_key, (old_value, old_size) = self._entries.popitem(last=False)
+                self.size -= old_size
+                evicted.append((old_key, old_value, old_size))
+        if self.spill_dir:
+            for old_key, old_value, old_size in evicted:
+                self._spill(old_key, old_value, old_size)
+
+    def _spill(self, key, value, size):
+        if size > self.spill_max_bytes:
+            return
+        path = self._spill_path(key)
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(value)
+        except OSError:
+            return
+        stale = []
+        with self._lock:
+            previous = self._spilled.pop(key, None)
+            if previous is not None:
+                self.spill_size -= previous[1]
+            self._spilled[key] = (path, size)
+            self.spill_size += size
+            while self.spill_size > self.spill_max_bytes:
+                _, (old_path, old_size) = self._spilled.popitem(last=False)
+                self.spill_size -= old_size
+                stale.append(old_path)
+        for old_path in stale:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            spilled = [path for path, _ in self._spilled.values()]
+            self._entries.clear()
+            self._spilled.clear()
+            self.size = 0
+            self.spill_size = 0
+        for path in spilled:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "spilled_entries": len(self._spilled),
+                "spilled_bytes": self.spill_size,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+            }
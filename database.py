@@ -1,15 +1,154 @@
 # database.py
+import atexit
 import sqlite3
 import csv
+import json
+import os
+import threading
+import time
+
+import backends
+import gateway
+import identity
+import like_buffer
+import models
+import replica
+import sketches
+
+# backup, delta_export i sharding są importowane dopiero przy pierwszym
+# użyciu - nie są potrzebne do obsługi zwykłych żądań, a wydłużają start.
+
+# DSN bazy danych (backends.py); domyślnie plik database.sqlite w katalogu
+# projektu, niezależnie od bieżącego katalogu.
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///database.sqlite")
+
+_backend = None
+
+# Klasa połączeń sqlite3 (z pulą backendu); profiling.py podmienia ją na
+# mierzącą czas zapytań
+CONNECTION_FACTORY = backends.PooledConnection
+
+# Funkcje wywoływane po każdej zmianie bazy w configure() - np. czyszczenie
+# cache fragmentów HTML w app.py
+_configure_hooks = []
+
+def on_configure(callback):
+    _configure_hooks.append(callback)
+
+def configure(url):
+    global _backend, DATABASE_URL, _sketches, _sketch_delta, _sketch_dirty, _sketch_rebuilding, _sketch_generation
+    global _rollup_pending
+    if _backend is not None:
+        # Niezapisane zmiany szkiców należą do dotychczasowej bazy
+        persist_sketches()
+        _backend.close()
+    DATABASE_URL = url
+    _backend = backends.from_url(url)
+    _identity.invalidate_users()
+    _identity.invalidate_posts()
+    # Stan w pamięci dotyczył poprzedniej bazy; przebudowy i zapisy szkiców
+    # rozpoczęte wcześniej nie nadpiszą już nowego stanu (_sketch_generation)
+    with _sketch_lock:
+        _sketches = None
+        _sketch_delta = None
+        _sketch_dirty = False
+        _sketch_rebuilding = False
+        _sketch_generation += 1
+    _rollup_pending = True
+    for callback in _configure_hooks:
+        callback()
+    return _backend
+
+def get_backend():
+    if _backend is None:
+        configure(DATABASE_URL)
+    return _backend
 
 def get_db_connection():
-    conn = sqlite3.connect("database.sqlite")
+    conn = get_backend().connect(CONNECTION_FACTORY)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# Ciężkie odczyty (agregaty analityczne, eksporty) trafiają do repliki tylko do
+# odczytu, o ile nie jest starsza niż REPLICA_MAX_STALENESS sekund.
+REPLICA_ENABLED = True
+REPLICA_MAX_STALENESS = 30
+
+_replica = None
+
+def _get_replica():
+    # Replika wymaga bazy w pliku - dla bazy w pamięci zwracamy None
+    global _replica
+    path = get_backend().path
+    if path is None:
+        return None
+    if _replica is None or _replica.primary_path != path:
+        _replica = replica.Replica(path, max_staleness=REPLICA_MAX_STALENESS)
+    return _replica
+
+def get_read_connection():
+    conn = None
+    if REPLICA_ENABLED and _get_replica() is not None:
+        conn = _get_replica().connect(CONNECTION_FACTORY)
+    if conn is None:
+        return get_db_connection()
     conn.row_factory = sqlite3.Row
     return conn
 
+def refresh_replica():
+    if _get_replica() is None:
+        print("⚠ Błąd: Replika wymaga bazy danych w pliku!")
+    elif _get_replica().refresh():
+        print("🔁 Odświeżono replikę bazy danych.")
+    else:
+        print(f"⚠ Błąd: Nie udało się odświeżyć repliki! ({_get_replica().last_error})")
+
+def start_replica_refresher(interval=REPLICA_MAX_STALENESS / 2):
+    if REPLICA_ENABLED and _get_replica() is not None:
+        _get_replica().start(interval)
+
+def get_replica_status():
+    if _get_replica() is None:
+        return {"path": None, "lag": None, "max_staleness": REPLICA_MAX_STALENESS, "last_duration": None,
+                "refresh_count": 0, "refreshing": False, "last_error": "Baza w pamięci - brak repliki"}
+    return _get_replica().status()
+
+# Opcjonalny backend shardowany (sharding.py): użytkownicy, posty, komentarze
+# i polubienia w SHARD_COUNT plikach w katalogu SHARD_DIR. Odczyty, rankingi
+# (także okienkowe - liczone wprost z shardów zamiast z rollupów), porządki
+# i eksporty CSV idą przez ShardedStore. Logi, szkice i CDC zostają na głównej
+# bazie, a eksport przyrostowy obejmuje wtedy tylko logi.
+SHARDING_ENABLED = False
+SHARD_DIR = "shards"
+SHARD_COUNT = 4
+
+SHARDED_TABLES = ("users", "posts", "comments", "likes")
+
+_shards = None
+_shards_lock = threading.Lock()
+
+def _get_shards():
+    global _shards
+    with _shards_lock:
+        if _shards is None:
+            import sharding
+            _shards = sharding.ShardedStore(backends.resolve_path(SHARD_DIR), SHARD_COUNT)
+        return _shards
+
+# Wersja schematu w PRAGMA user_version: przy aktualnym schemacie init_db
+# kończy się jednym odczytem zamiast kilkudziesięciu CREATE ... IF NOT EXISTS.
+# Podbić przy każdej zmianie DDL w init_db.
+SCHEMA_VERSION = 2
+
 def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= SCHEMA_VERSION:
+        conn.close()
+        return
+    # WAL: czytelnicy (także kopie zapasowe i replika) nie blokują zapisujących
+    cursor.execute("PRAGMA journal_mode=WAL")
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS users (
@@ -59,37 +198,432 @@ def init_db():
     )
     """)
 
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_user_activity (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        posts INTEGER NOT NULL DEFAULT 0,
+        comments INTEGER NOT NULL DEFAULT 0,
+        likes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, bucket, user_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_post_activity (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        post_id INTEGER NOT NULL,
+        comments INTEGER NOT NULL DEFAULT 0,
+        likes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, bucket, post_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        source TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_likes_delete_rollup'")
+    if cursor.fetchone() is None:
+        # Rollupy liczone bez triggerów usuwania mogły się rozjechać -
+        # wątek odświeżający przeliczy je od zera
+        cursor.execute("DELETE FROM rollup_user_activity")
+        cursor.execute("DELETE FROM rollup_post_activity")
+        cursor.execute("DELETE FROM rollup_watermarks")
+    _create_rollup_triggers(cursor)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sketches (
+        name TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    _create_version_triggers(cursor)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS changelog (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        op TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cdc_consumers (
+        name TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    _create_changelog_triggers(cursor)
+
+    stats_exist = _table_exists(cursor, "post_stats") and _table_exists(cursor, "user_stats")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS post_stats (
+        post_id INTEGER PRIMARY KEY,
+        comment_count INTEGER NOT NULL DEFAULT 0,
+        like_count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        post_count INTEGER NOT NULL DEFAULT 0,
+        like_count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    _create_stats_triggers(cursor)
+    if not stats_exist:
+        _rebuild_stats(cursor)
+
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_user_id ON posts(user_id);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts(created_at);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_likes_post_id ON likes(post_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_created_at ON logs(created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_post_stats_comments ON post_stats(comment_count DESC, post_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_stats_posts ON user_stats(post_count DESC, user_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_stats_likes ON user_stats(like_count DESC, user_id);")
 
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
     conn.close()
 
+def _table_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+# Liczniki w post_stats/user_stats są utrzymywane przez triggery, dzięki czemu
+# rankingi top-N to przejście po indeksie z LIMIT zamiast agregacji całych tabel.
+STATS_TRIGGERS = {
+    "trg_users_insert_stats": """
+    AFTER INSERT ON users BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.id);
+    END""",
+    "trg_users_delete_stats": """
+    AFTER DELETE ON users BEGIN
+        DELETE FROM user_stats WHERE user_id = OLD.id;
+    END""",
+    "trg_posts_insert_stats": """
+    AFTER INSERT ON posts BEGIN
+        INSERT OR IGNORE INTO post_stats (post_id) VALUES (NEW.id);
+        INSERT INTO user_stats (user_id, post_count) VALUES (NEW.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET post_count = post_count + 1;
+    END""",
+    "trg_posts_delete_stats": """
+    AFTER DELETE ON posts BEGIN
+        DELETE FROM post_stats WHERE post_id = OLD.id;
+        UPDATE user_stats SET post_count = post_count - 1 WHERE user_id = OLD.user_id;
+    END""",
+    "trg_comments_insert_stats": """
+    AFTER INSERT ON comments BEGIN
+        INSERT INTO post_stats (post_id, comment_count) VALUES (NEW.post_id, 1)
+        ON CONFLICT (post_id) DO UPDATE SET comment_count = comment_count + 1;
+    END""",
+    "trg_comments_delete_stats": """
+    AFTER DELETE ON comments BEGIN
+        UPDATE post_stats SET comment_count = comment_count - 1 WHERE post_id = OLD.post_id;
+    END""",
+    "trg_likes_insert_stats": """
+    AFTER INSERT ON likes BEGIN
+        INSERT INTO post_stats (post_id, like_count) VALUES (NEW.post_id, 1)
+        ON CONFLICT (post_id) DO UPDATE SET like_count = like_count + 1;
+        INSERT INTO user_stats (user_id, like_count) VALUES (NEW.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET like_count = like_count + 1;
+    END""",
+    "trg_likes_delete_stats": """
+    AFTER DELETE ON likes BEGIN
+        UPDATE post_stats SET like_count = like_count - 1 WHERE post_id = OLD.post_id;
+        UPDATE user_stats SET like_count = like_count - 1 WHERE user_id = OLD.user_id;
+    END""",
+}
+
+def _create_stats_triggers(cursor):
+    for name, body in STATS_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+# Licznik wersji każdej tabeli, podbijany triggerami przy każdej zmianie -
+# klucz unieważniający cache wyrenderowanych fragmentów list.
+VERSIONED_TABLES = ("users", "posts", "comments", "likes")
+
+def _create_version_triggers(cursor):
+    for table in VERSIONED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (table,))
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version
+            AFTER {operation} ON {table} BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END""")
+
+# CDC: każda zmiana wiersza w tabelach z CDC_COLUMNS trafia przez trigger do
+# tabeli changelog z rosnącym numerem seq (AUTOINCREMENT nie używa ponownie
+# numerów, także po kompakcji).
+CDC_COLUMNS = {
+    "users": ("id", "username", "email", "created_at"),
+    "posts": ("id", "user_id", "content", "created_at"),
+    "comments": ("id", "user_id", "post_id", "content", "created_at"),
+    "likes": ("id", "user_id", "post_id", "created_at"),
+}
+CDC_MAX_LIMIT = 1000
+CDC_MAX_WAIT = 30
+CDC_POLL_INTERVAL = 0.2
+
+def _create_changelog_triggers(cursor):
+    for table, columns in CDC_COLUMNS.items():
+        for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            data = ", ".join(f"'{column}', {row}.{column}" for column in columns)
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_cdc
+            AFTER {operation} ON {table} BEGIN
+                INSERT INTO changelog (table_name, op, row_id, data)
+                VALUES ('{table}', '{operation.lower()}', {row}.id, json_object({data}));
+            END""")
+
+def get_changes(since=0, limit=100):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT seq, table_name, op, row_id, data, created_at FROM changelog
+    WHERE seq > ?
+    ORDER BY seq
+    LIMIT ?
+    """, (int(since), max(1, min(int(limit), CDC_MAX_LIMIT))))
+    changes = [{"seq": row["seq"], "table": row["table_name"], "op": row["op"],
+                "row_id": row["row_id"], "data": json.loads(row["data"]),
+                "created_at": row["created_at"]}
+               for row in cursor.fetchall()]
+    conn.close()
+    return changes
+
+def wait_for_changes(since=0, limit=100, timeout=CDC_MAX_WAIT):
+    # Long-polling: czekamy na nowe wpisy najwyżej `timeout` sekund
+    deadline = time.monotonic() + max(0, min(timeout, CDC_MAX_WAIT))
+    while True:
+        changes = get_changes(since, limit)
+        if changes or time.monotonic() >= deadline:
+            return changes
+        time.sleep(CDC_POLL_INTERVAL)
+
+def get_consumer_offset(consumer):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_seq FROM cdc_consumers WHERE name = ?", (consumer,))
+    row = cursor.fetchone()
+    conn.close()
+    return row["last_seq"] if row else 0
+
+def ack_changes(consumer, seq):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    INSERT INTO cdc_consumers (name, last_seq) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET
+        last_seq = MAX(last_seq, excluded.last_seq),
+        updated_at = CURRENT_TIMESTAMP
+    """, (consumer, int(seq)))
+    conn.commit()
+    conn.close()
+
+def compact_changelog():
+    # Usuwamy wpisy potwierdzone przez wszystkich zarejestrowanych konsumentów
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    DELETE FROM changelog
+    WHERE seq <= (SELECT COALESCE(MIN(last_seq), 0) FROM cdc_consumers)
+    """)
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    print(f"🗜 Kompakcja changelogu: usunięto {deleted} wpisów.")
+    return deleted
+
+def get_cdc_status():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) AS entries, MIN(seq) AS first_seq, MAX(seq) AS last_seq FROM changelog")
+    status = dict(cursor.fetchone())
+    cursor.execute("SELECT name, last_seq, updated_at FROM cdc_consumers ORDER BY name")
+    status["consumers"] = cursor.fetchall()
+    conn.close()
+    return status
+
+def get_table_versions(*tables):
+    if SHARDING_ENABLED:
+        return _get_shards().table_versions(*tables)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in tables)
+    cursor.execute(f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})", tables)
+    versions = {row["name"]: row["version"] for row in cursor.fetchall()}
+    conn.close()
+    return tuple(versions.get(table, 0) for table in tables)
+
+def _rebuild_stats(cursor):
+    cursor.execute("DELETE FROM post_stats")
+    cursor.execute("DELETE FROM user_stats")
+    cursor.execute("""
+    INSERT INTO post_stats (post_id, comment_count, like_count)
+    SELECT posts.id,
+           (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id),
+           (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id)
+    FROM posts
+    """)
+    cursor.execute("""
+    INSERT INTO user_stats (user_id, post_count, like_count)
+    SELECT users.id,
+           (SELECT COUNT(*) FROM posts WHERE posts.user_id = users.id),
+           (SELECT COUNT(*) FROM likes WHERE likes.user_id = users.id)
+    FROM users
+    """)
+
+# Cache istnienia id (identity.py): trafienie pomija SELECT przed INSERT,
+# a poprawność i tak gwarantuje PRAGMA foreign_keys na połączeniu zapisu.
+IDENTITY_CACHE_ENABLED = True
+
+_identity = identity.IdentityCache()
+_identity_warming = False
+_identity_warming_lock = threading.Lock()
+
+def warm_identity_cache():
+    # Pełny skan id - poza transakcjami zapisu (start_identity_warmup)
+    generation = _identity.begin_warm()
+    users, posts = identity.IdBitmap(), identity.IdBitmap()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    for row in cursor.execute("SELECT id FROM users"):
+        users.add(row[0])
+    for row in cursor.execute("SELECT id FROM posts"):
+        posts.add(row[0])
+    conn.close()
+    return _identity.finish_warm(generation, users, posts)
+
+def start_identity_warmup():
+    # Rozgrzewa cache w wątku w tle; do tego czasu istnienie sprawdza SELECT
+    global _identity_warming
+    if not IDENTITY_CACHE_ENABLED or SHARDING_ENABLED:
+        return
+    with _identity_warming_lock:
+        if _identity_warming:
+            return
+        _identity_warming = True
+
+    def run():
+        global _identity_warming
+        try:
+            warm_identity_cache()
+        except sqlite3.Error as e:
+            print(f"⚠ Błąd: Nie udało się rozgrzać cache identyfikatorów! ({e})")
+        finally:
+            with _identity_warming_lock:
+                _identity_warming = False
+
+    threading.Thread(target=run, name="identity-warmup", daemon=True).start()
+
+def get_identity_cache_stats():
+    return _identity.stats()
+
+def _user_exists(cursor, user_id):
+    if IDENTITY_CACHE_ENABLED:
+        if _identity.has_user(user_id):
+            return True
+        if not _identity.users_warm:
+            start_identity_warmup()
+    cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+    if cursor.fetchone() is None:
+        return False
+    _identity.add_user(user_id)
+    return True
+
+def _post_exists(cursor, post_id):
+    if IDENTITY_CACHE_ENABLED:
+        if _identity.has_post(post_id):
+            return True
+        if not _identity.posts_warm:
+            start_identity_warmup()
+    cursor.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
+    if cursor.fetchone() is None:
+        return False
+    _identity.add_post(post_id)
+    return True
+
+def get_user_id(username):
+    if SHARDING_ENABLED:
+        return _get_shards().get_user_id(username)
+    user_id = _identity.user_id(username) if IDENTITY_CACHE_ENABLED else None
+    if user_id is not None:
+        return user_id
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    _identity.remember_username(username, row["id"])
+    return row["id"]
+
 def add_user(username, email):
+    if SHARDING_ENABLED:
+        try:
+            _get_shards().add_user(username, email)
+        except sqlite3.IntegrityError as e:
+            print(f"⚠ Błąd: Użytkownik {username} lub email {email} już istnieje! ({e})")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("INSERT INTO users (username, email) VALUES (?, ?)", (username, email))
         conn.commit()
+        _identity.add_user(cursor.lastrowid, username)
     except sqlite3.IntegrityError as e:
         conn.rollback()
         print(f"⚠ Błąd: Użytkownik {username} lub email {email} już istnieje! ({e})")
     conn.close()
 
 def add_post(user_id, content):
+    if SHARDING_ENABLED:
+        try:
+            _get_shards().add_post(int(user_id), content)
+            log_event("Dodano post", f"Użytkownik {user_id} dodał post: '{content}'")
+        except (sqlite3.IntegrityError, ValueError) as e:
+            print(f"⚠ Błąd: Nie można dodać postu dla użytkownika {user_id}! ({e})")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
     try:
         user_id = int(user_id)
-        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-        if not cursor.fetchone():
+        if not _user_exists(cursor, user_id):
             raise ValueError(f"Użytkownik o ID {user_id} nie istnieje!")
         cursor.execute("INSERT INTO posts (user_id, content) VALUES (?, ?)", (user_id, content))
+        post_id = cursor.lastrowid
         conn.commit()
+        _identity.add_post(post_id)
+        if get_backend().hot is not None:
+            # Write-through: post jest już na dysku, teraz trafia do pamięci
+            cursor.execute("""
+            SELECT posts.id, users.username, posts.content, posts.created_at
+            FROM posts
+            JOIN users ON posts.user_id = users.id
+            WHERE posts.id = ?
+            """, (post_id,))
+            get_backend().hot.add(tuple(cursor.fetchone()))
         log_event("Dodano post", f"Użytkownik {user_id} dodał post: '{content}'")
     except (sqlite3.IntegrityError, ValueError) as e:
         conn.rollback()
@@ -97,19 +631,29 @@ def add_post(user_id, content):
     conn.close()
 
 def add_comment(user_id, post_id, content):
+    if SHARDING_ENABLED:
+        try:
+            user_id = int(user_id)
+            post_id = int(post_id)
+            _get_shards().add_comment(user_id, post_id, content)
+            _record_sketch(lambda approx: approx.record_comment(user_id, post_id))
+            log_event("Dodano komentarz", f"Użytkownik {user_id} skomentował post {post_id}: '{content}'")
+        except (sqlite3.IntegrityError, ValueError) as e:
+            print(f"⚠ Błąd: Nie można dodać komentarza! ({e})")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
     try:
         user_id = int(user_id)
         post_id = int(post_id)
-        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-        if not cursor.fetchone():
+        if not _user_exists(cursor, user_id):
             raise ValueError(f"Użytkownik o ID {user_id} nie istnieje!")
-        cursor.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
-        if not cursor.fetchone():
+        if not _post_exists(cursor, post_id):
             raise ValueError(f"Post o ID {post_id} nie istnieje!")
         cursor.execute("INSERT INTO comments (user_id, post_id, content) VALUES (?, ?, ?)", (user_id, post_id, content))
         conn.commit()
+        _record_sketch(lambda approx: approx.record_comment(user_id, post_id))
         log_event("Dodano komentarz", f"Użytkownik {user_id} skomentował post {post_id}: '{content}'")
     except (sqlite3.IntegrityError, ValueError) as e:
         conn.rollback()
@@ -117,79 +661,424 @@ def add_comment(user_id, post_id, content):
     conn.close()
 
 def add_like(user_id, post_id):
+    if SHARDING_ENABLED:
+        _apply_sharded_like(user_id, post_id, True)
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
     try:
         user_id = int(user_id)
         post_id = int(post_id)
-        cursor.execute("INSERT INTO likes (user_id, post_id) VALUES (?, ?)", (user_id, post_id))
+        cursor.execute("""
+        INSERT INTO likes (user_id, post_id) VALUES (?, ?)
+        ON CONFLICT (user_id, post_id) DO NOTHING
+        """, (user_id, post_id))
+        added = cursor.rowcount > 0
         conn.commit()
-        log_event("Dodano polubienie", f"Użytkownik {user_id} polubił post {post_id}")
-    except sqlite3.IntegrityError as e:
+        if added:
+            _record_sketch(lambda approx: approx.record_like(user_id, post_id))
+            log_event("Dodano polubienie", f"Użytkownik {user_id} polubił post {post_id}")
+        else:
+            print(f"ℹ Użytkownik {user_id} już polubił post {post_id}.")
+    except (sqlite3.IntegrityError, ValueError) as e:
         conn.rollback()
         print(f"⚠ Błąd: Nie można dodać polubienia! ({e})")
     conn.close()
 
-def log_event(event, details):
+def remove_like(user_id, post_id):
+    if SHARDING_ENABLED:
+        _apply_sharded_like(user_id, post_id, False)
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO logs (event, details) VALUES (?, ?)", (event, details))
+        user_id = int(user_id)
+        post_id = int(post_id)
+        cursor.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?", (user_id, post_id))
+        removed = cursor.rowcount > 0
         conn.commit()
-    except sqlite3.Error as e:
-        print(f"⚠ Błąd podczas logowania zdarzenia: {e}")
+        if removed:
+            _record_sketch(lambda approx: approx.record_unlike(user_id, post_id))
+            log_event("Usunięto polubienie", f"Użytkownik {user_id} cofnął polubienie postu {post_id}")
+        else:
+            print(f"ℹ Użytkownik {user_id} nie lubił postu {post_id}.")
+    except (sqlite3.Error, ValueError) as e:
+        conn.rollback()
+        print(f"⚠ Błąd: Nie można usunąć polubienia! ({e})")
     conn.close()
 
-def get_users():
+def _apply_sharded_like(user_id, post_id, liked):
+    try:
+        user_id = int(user_id)
+        post_id = int(post_id)
+        added, removed, rejected = _get_shards().apply_like_changes({(user_id, post_id): liked})
+    except (sqlite3.Error, ValueError) as e:
+        print(f"⚠ Błąd: Nie można zapisać polubienia! ({e})")
+        return
+    if added:
+        _record_sketch(lambda approx: approx.record_like(user_id, post_id))
+        log_event("Dodano polubienie", f"Użytkownik {user_id} polubił post {post_id}")
+    elif removed:
+        _record_sketch(lambda approx: approx.record_unlike(user_id, post_id))
+        log_event("Usunięto polubienie", f"Użytkownik {user_id} cofnął polubienie postu {post_id}")
+    elif rejected:
+        print(f"⚠ Błąd: Nie można dodać polubienia! (Post o ID {post_id} nie istnieje!)")
+    elif liked:
+        print(f"ℹ Użytkownik {user_id} już polubił post {post_id}.")
+    else:
+        print(f"ℹ Użytkownik {user_id} nie lubił postu {post_id}.")
+
+# Domyślny limit parametrów zapytania w SQLite (SQLITE_MAX_VARIABLE_NUMBER
+# w starszych wersjach) - listy id dzielimy na paczki tej wielkości.
+SQLITE_MAX_VARIABLES = 999
+
+def _chunked(items, size=SQLITE_MAX_VARIABLES):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def has_liked(user_id, post_ids):
+    if SHARDING_ENABLED:
+        return _get_shards().has_liked(int(user_id), post_ids)
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    users = cursor.fetchall()
+    liked = set()
+    for chunk in _chunked({int(post_id) for post_id in post_ids}, SQLITE_MAX_VARIABLES - 1):
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(f"""
+        SELECT post_id FROM likes
+        WHERE user_id = ? AND post_id IN ({placeholders})
+        """, [int(user_id), *chunk])
+        liked.update(row["post_id"] for row in cursor.fetchall())
     conn.close()
-    return users
+    return liked
 
-def get_posts():
+def apply_like_changes(changes):
+    # changes: {(user_id, post_id): True (polub) / False (cofnij)} - całość
+    # w jednej transakcji; pary naruszające klucze obce są pomijane.
+    if SHARDING_ENABLED:
+        try:
+            added, removed, rejected = _get_shards().apply_like_changes(changes)
+        except sqlite3.Error as e:
+            print(f"⚠ Błąd: Nie można zapisać paczki polubień! ({e})")
+            return 0, 0
+        return _finish_like_changes(added, removed, rejected)
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute("PRAGMA foreign_keys = ON")
+    added, removed, rejected = [], [], []
+    try:
+        cursor.execute("BEGIN")
+        for (user_id, post_id), liked in changes.items():
+            try:
+                if liked:
+                    cursor.execute("""
+                    INSERT INTO likes (user_id, post_id) VALUES (?, ?)
+                    ON CONFLICT (user_id, post_id) DO NOTHING
+                    """, (user_id, post_id))
+                    if cursor.rowcount > 0:
+                        added.append((user_id, post_id))
+                else:
+                    cursor.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?", (user_id, post_id))
+                    if cursor.rowcount > 0:
+                        removed.append((user_id, post_id))
+            except sqlite3.IntegrityError:
+                rejected.append((user_id, post_id))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        conn.close()
+        print(f"⚠ Błąd: Nie można zapisać paczki polubień! ({e})")
+        return 0, 0
+    conn.close()
+    return _finish_like_changes(added, removed, rejected)
+
+def _finish_like_changes(added, removed, rejected):
+    def record(approx):
+        for user_id, post_id in added:
+            approx.record_like(user_id, post_id)
+        for user_id, post_id in removed:
+            approx.record_unlike(user_id, post_id)
+    if added or removed:
+        _record_sketch(record)
+        log_event("Paczka polubień", f"Dodano {len(added)}, cofnięto {len(removed)} polubień")
+    if rejected:
+        print(f"⚠ Pominięto {len(rejected)} polubień z nieistniejącym użytkownikiem lub postem.")
+    return len(added), len(removed)
+
+def add_likes(pairs):
+    return apply_like_changes({(int(user_id), int(post_id)): True for user_id, post_id in pairs})
+
+# Bufor koalescujący polubienia z gorących postów (like_buffer.py)
+LIKE_COALESCE_WINDOW = 0.05
+LIKE_COALESCE_MAX_PENDING = 1000
+
+_like_buffer = like_buffer.LikeBuffer(lambda changes: apply_like_changes(changes),
+                                      LIKE_COALESCE_WINDOW, LIKE_COALESCE_MAX_PENDING)
+
+def submit_like(user_id, post_id, liked=True):
+    _like_buffer.submit(user_id, post_id, liked)
+
+def flush_likes():
+    return _like_buffer.flush()
+
+def _flush_likes_at_exit():
+    # Bufor opróżnia timer w wątku-demonie, więc przy wyjściu zapisujemy
+    # resztę sami. atexit woła funkcje od ostatnio zarejestrowanej - szkice
+    # trzeba zapisać jeszcze raz, już z tymi polubieniami.
+    if flush_likes():
+        persist_sketches()
+
+atexit.register(_flush_likes_at_exit)
+
+def get_like_buffer_stats():
+    return _like_buffer.stats()
+
+# Bramka zapisów (gateway.py): komentarze i polubienia z endpointów HTTP są
+# kolejkowane i zapisywane paczkami co WRITE_GATEWAY_INTERVAL sekund.
+WRITE_GATEWAY_INTERVAL = 0.005
+WRITE_GATEWAY_MAX_BATCH = 256
+WRITE_GATEWAY_MAX_QUEUE = 2000
+WRITE_GATEWAY_TIMEOUT = 5.0
+
+def apply_writes(ops):
+    # Group commit: wszystkie operacje w jednej transakcji, każda we własnym
+    # SAVEPOINT - błąd jednej (np. nieistniejący post) nie wycofuje pozostałych.
+    # ops: [("comment", (user_id, post_id, content)), ("like"/"unlike", (user_id, post_id))]
+    if SHARDING_ENABLED:
+        return _apply_sharded_writes(ops)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    results, updates, events = [], [], []
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for op, args in ops:
+            cursor.execute("SAVEPOINT write_op")
+            try:
+                user_id, post_id = int(args[0]), int(args[1])
+                if op == "comment":
+                    if not _user_exists(cursor, user_id):
+                        raise ValueError(f"Użytkownik o ID {user_id} nie istnieje!")
+                    if not _post_exists(cursor, post_id):
+                        raise ValueError(f"Post o ID {post_id} nie istnieje!")
+                    cursor.execute("INSERT INTO comments (user_id, post_id, content) VALUES (?, ?, ?)",
+                                   (user_id, post_id, args[2]))
+                    changed = True
+                elif op == "like":
+                    cursor.execute("""
+                    INSERT INTO likes (user_id, post_id) VALUES (?, ?)
+                    ON CONFLICT (user_id, post_id) DO NOTHING
+                    """, (user_id, post_id))
+                    changed = cursor.rowcount > 0
+                elif op == "unlike":
+                    cursor.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?", (user_id, post_id))
+                    changed = cursor.rowcount > 0
+                else:
+                    raise ValueError(f"Nieznana operacja: {op}")
+                cursor.execute("RELEASE write_op")
+                if changed:
+                    update, event = _write_effects(op, args)
+                    updates.append(update)
+                    events.append(event)
+                results.append(changed)
+            except (sqlite3.IntegrityError, ValueError, TypeError, IndexError) as e:
+                cursor.execute("ROLLBACK TO write_op")
+                cursor.execute("RELEASE write_op")
+                print(f"⚠ Błąd: Nie można zapisać operacji {op}! ({e})")
+                results.append(False)
+        entries = []
+        for event, details in events:
+            cursor.execute("INSERT INTO logs (event, details) VALUES (?, ?)", (event, details))
+            entries.append({"id": cursor.lastrowid, "event": event, "details": details,
+                            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())})
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"⚠ Błąd: Nie można zapisać paczki operacji! ({e})")
+        return [False] * len(ops)
+    finally:
+        conn.close()
+    _record_write_effects(updates, entries)
+    return results
+
+def _write_effects(op, args):
+    # (aktualizacja szkiców, wpis do logów) dla operacji, która coś zmieniła
+    user_id, post_id = int(args[0]), int(args[1])
+    if op == "comment":
+        return (lambda approx: approx.record_comment(user_id, post_id),
+                ("Dodano komentarz", f"Użytkownik {user_id} skomentował post {post_id}: '{args[2]}'"))
+    if op == "like":
+        return (lambda approx: approx.record_like(user_id, post_id),
+                ("Dodano polubienie", f"Użytkownik {user_id} polubił post {post_id}"))
+    return (lambda approx: approx.record_unlike(user_id, post_id),
+            ("Usunięto polubienie", f"Użytkownik {user_id} cofnął polubienie postu {post_id}"))
+
+def _record_write_effects(updates, entries):
+    def record(approx):
+        for update in updates:
+            update(approx)
+        for entry in entries:
+            approx.record_log(entry)
+    if updates or entries:
+        _record_sketch(record)
+
+def _apply_sharded_writes(ops):
+    # Zapisy trafiają na shardy (paczka na shard), logi - jedną transakcją
+    # na główną bazę
+    results, errors = _get_shards().apply_writes(ops)
+    for op, error in errors:
+        print(f"⚠ Błąd: Nie można zapisać operacji {op}! ({error})")
+    effects = [_write_effects(op, args) for (op, args), changed in zip(ops, results) if changed]
+    entries = []
+    if effects:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            for _, (event, details) in effects:
+                cursor.execute("INSERT INTO logs (event, details) VALUES (?, ?)", (event, details))
+                entries.append({"id": cursor.lastrowid, "event": event, "details": details,
+                                "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())})
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            entries = []
+            print(f"⚠ Błąd podczas logowania zdarzenia: {e}")
+        conn.close()
+    _record_write_effects([update for update, _ in effects], entries)
+    return results
+
+_write_gateway = gateway.WriteGateway(lambda ops: apply_writes(ops), WRITE_GATEWAY_INTERVAL,
+                                      WRITE_GATEWAY_MAX_BATCH, WRITE_GATEWAY_MAX_QUEUE,
+                                      WRITE_GATEWAY_TIMEOUT)
+
+def submit_write(op, *args):
+    # Czeka na zapis paczki; gateway.Overloaded przy przeciążeniu
+    return _write_gateway.submit(op, *args)
+
+def get_gateway_stats():
+    return _write_gateway.stats()
+
+def log_event(event, details):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO logs (event, details) VALUES (?, ?)", (event, details))
+        conn.commit()
+        entry = {"id": cursor.lastrowid, "event": event, "details": details,
+                 "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())}
+        _record_sketch(lambda approx: approx.record_log(entry))
+    except sqlite3.Error as e:
+        print(f"⚠ Błąd podczas logowania zdarzenia: {e}")
+    conn.close()
+
+def _iter_models(model, query, params=()):
+    # Generator: połączenie pozostaje otwarte do wyczerpania (lub zamknięcia)
+    # generatora, a wiersze są zamieniane w modele jeden po drugim.
+    conn = get_db_connection()
+    conn.row_factory = None
+    make = models.constructor(model)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(256)
+            if not rows:
+                break
+            yield from map(make, rows)
+    finally:
+        conn.close()
+
+def iter_users():
+    if SHARDING_ENABLED:
+        return map(models.constructor(models.User), _get_shards().iter_users())
+    return _iter_models(models.User, "SELECT id, username, email, created_at FROM users")
+
+def iter_posts():
+    if SHARDING_ENABLED:
+        return map(models.constructor(models.Post), _get_shards().iter_posts())
+    return _iter_models(models.Post, """
     SELECT posts.id, users.username, posts.content, posts.created_at
     FROM posts
     JOIN users ON posts.user_id = users.id
     ORDER BY posts.created_at DESC
     """)
-    posts = cursor.fetchall()
-    conn.close()
-    return posts
 
-def get_comments():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def iter_comments():
+    if SHARDING_ENABLED:
+        return map(models.constructor(models.Comment), _get_shards().iter_comments())
+    return _iter_models(models.Comment, """
     SELECT c.id, u.username, p.content AS post_content, c.content, c.created_at
     FROM comments c
     JOIN users u ON c.user_id = u.id
     JOIN posts p ON c.post_id = p.id
     ORDER BY c.created_at DESC
     """)
-    comments = cursor.fetchall()
-    conn.close()
-    return comments
 
-def get_likes():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def iter_likes():
+    if SHARDING_ENABLED:
+        return map(models.constructor(models.Like), _get_shards().iter_likes())
+    return _iter_models(models.Like, """
     SELECT likes.id, users.username, posts.content, likes.created_at
     FROM likes
     JOIN users ON likes.user_id = users.id
     JOIN posts ON likes.post_id = posts.id
     ORDER BY likes.created_at DESC
     """)
-    likes = cursor.fetchall()
+
+# Najnowsze posty: w silniku hybrydowym z pamięci (backends.HotPosts)
+DEFAULT_RECENT_POSTS = 10
+
+def _warm_hot_posts(hot):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT posts.id, users.username, posts.content, posts.created_at
+    FROM posts
+    JOIN users ON posts.user_id = users.id
+    ORDER BY posts.created_at DESC, posts.id DESC
+    LIMIT ?
+    """, (hot.capacity,))
+    hot.load([tuple(row) for row in cursor.fetchall()])
     conn.close()
-    return likes
+
+def get_recent_posts(limit=DEFAULT_RECENT_POSTS):
+    if SHARDING_ENABLED:
+        return list(map(models.constructor(models.Post), _get_shards().recent_posts(limit)))
+    hot = get_backend().hot
+    if hot is not None:
+        if not hot.warm:
+            _warm_hot_posts(hot)
+        rows = hot.recent(limit)
+        if rows is not None:
+            return list(map(models.constructor(models.Post), rows))
+    return list(_iter_models(models.Post, """
+    SELECT posts.id, users.username, posts.content, posts.created_at
+    FROM posts
+    JOIN users ON posts.user_id = users.id
+    ORDER BY posts.created_at DESC, posts.id DESC
+    LIMIT ?
+    """, (limit,)))
+
+def _invalidate_hot_posts():
+    if get_backend().hot is not None:
+        get_backend().hot.invalidate()
+
+def get_users():
+    return list(iter_users())
+
+def get_posts():
+    return list(iter_posts())
+
+def get_comments():
+    return list(iter_comments())
+
+def get_likes():
+    return list(iter_likes())
 
 def get_user_posts(user_id):
+    if SHARDING_ENABLED:
+        return _get_shards().get_user_posts(int(user_id))
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
@@ -203,6 +1092,8 @@ def get_user_posts(user_id):
     return posts
 
 def get_post_comments(post_id):
+    if SHARDING_ENABLED:
+        return _get_shards().get_post_comments(int(post_id))
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
@@ -217,6 +1108,8 @@ def get_post_comments(post_id):
     return comments
 
 def get_post_likes(post_id):
+    if SHARDING_ENABLED:
+        return _get_shards().get_post_likes(int(post_id))
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM likes WHERE post_id = ?", (post_id,))
@@ -224,76 +1117,637 @@ def get_post_likes(post_id):
     conn.close()
     return likes_count
 
-def get_user_post_counts():
+# Wersje wsadowe: jedno zapytanie na paczkę id (IN, dzielone na paczki po
+# SQLITE_MAX_VARIABLES), wynik pogrupowany w słownik {id: ...}.
+def _group_by_ids(ids, query, key):
+    ids = list(dict.fromkeys(int(item_id) for item_id in ids))
+    grouped = {item_id: [] for item_id in ids}
     conn = get_db_connection()
     cursor = conn.cursor()
+    for chunk in _chunked(ids):
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(query.format(placeholders=placeholders), chunk)
+        for row in cursor.fetchall():
+            grouped[row[key]].append(row)
+    conn.close()
+    return grouped
+
+def get_user_posts_many(user_ids):
+    if SHARDING_ENABLED:
+        return _get_shards().get_user_posts_many(user_ids)
+    return _group_by_ids(user_ids, """
+    SELECT posts.user_id, posts.id, posts.content, posts.created_at
+    FROM posts
+    WHERE posts.user_id IN ({placeholders})
+    ORDER BY posts.created_at DESC
+    """, "user_id")
+
+def get_post_comments_many(post_ids):
+    if SHARDING_ENABLED:
+        return _get_shards().get_post_comments_many(post_ids)
+    return _group_by_ids(post_ids, """
+    SELECT c.post_id, c.id, u.username, c.content, c.created_at
+    FROM comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.post_id IN ({placeholders})
+    ORDER BY c.created_at DESC
+    """, "post_id")
+
+def get_post_like_counts(post_ids):
+    # Liczniki z post_stats (utrzymywane triggerami) - wyszukiwanie po kluczu
+    # zamiast COUNT(*) po likes dla każdego postu.
+    if SHARDING_ENABLED:
+        return _get_shards().get_post_like_counts(post_ids)
+    ids = list(dict.fromkeys(int(post_id) for post_id in post_ids))
+    counts = dict.fromkeys(ids, 0)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    for chunk in _chunked(ids):
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(f"""
+        SELECT post_id, like_count FROM post_stats
+        WHERE post_id IN ({placeholders})
+        """, chunk)
+        for row in cursor.fetchall():
+            counts[row["post_id"]] = row["like_count"]
+    conn.close()
+    return counts
+
+# Domyślne i maksymalne rozmiary rankingów top-N
+DEFAULT_TOP_LIMIT = 10
+MAX_TOP_LIMIT = 100
+
+def _sql_limit(limit):
+    # W SQLite LIMIT -1 oznacza brak limitu
+    return -1 if limit is None else int(limit)
+
+def get_user_post_counts(limit=None):
+    if SHARDING_ENABLED:
+        return _get_shards().get_user_post_counts(_sql_limit(limit))
+    conn = get_read_connection()
+    cursor = conn.cursor()
     cursor.execute("""
-    SELECT users.username, COUNT(posts.id) AS post_count
-    FROM users
-    LEFT JOIN posts ON users.id = posts.user_id
-    GROUP BY users.id
-    ORDER BY post_count DESC
-    """)
+    SELECT users.username, s.post_count
+    FROM user_stats s
+    JOIN users ON s.user_id = users.id
+    ORDER BY s.post_count DESC, s.user_id
+    LIMIT ?
+    """, (_sql_limit(limit),))
     results = cursor.fetchall()
     conn.close()
     return results
 
-def get_most_commented_posts():
+def get_most_commented_posts(limit=None):
+    if SHARDING_ENABLED:
+        return _get_shards().get_most_commented_posts(_sql_limit(limit))
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT posts.id, posts.content, users.username, s.comment_count
+    FROM post_stats s
+    JOIN posts ON s.post_id = posts.id
+    JOIN users ON posts.user_id = users.id
+    WHERE s.comment_count > 0
+    ORDER BY s.comment_count DESC, s.post_id
+    LIMIT ?
+    """, (_sql_limit(limit),))
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def get_top_likers(limit=None):
+    if SHARDING_ENABLED:
+        return _get_shards().get_top_likers(_sql_limit(limit))
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT users.username, s.like_count
+    FROM user_stats s
+    JOIN users ON s.user_id = users.id
+    WHERE s.like_count > 0
+    ORDER BY s.like_count DESC, s.user_id
+    LIMIT ?
+    """, (_sql_limit(limit),))
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def iter_logs(limit=None):
+    return _iter_models(models.LogEntry, """
+    SELECT id, event, details, created_at FROM logs
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+    """, (_sql_limit(limit),))
+
+def get_logs(limit=None):
+    return list(iter_logs(limit))
+
+# Rollupy: godzinowe i dzienne agregaty aktywności, liczone przyrostowo od
+# ostatniego przetworzonego id (high-water mark) każdej tabeli źródłowej.
+ROLLUP_GRANULARITIES = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d",
+}
+
+# Usunięcie wiersza, który rollupy już policzyły (id <= high-water mark),
+# zmniejsza jego kubełki w tej samej transakcji - dotyczy cofniętych polubień
+# i wierszy usuniętych kaskadowo razem z postem lub użytkownikiem.
+def _create_rollup_triggers(cursor):
+    for source in ("posts", "comments", "likes"):
+        updates = []
+        for granularity, fmt in ROLLUP_GRANULARITIES.items():
+            updates.append(f"""
+                UPDATE rollup_user_activity SET {source} = {source} - 1
+                WHERE granularity = '{granularity}' AND bucket = strftime('{fmt}', OLD.created_at)
+                  AND user_id = OLD.user_id;""")
+            if source != "posts":
+                updates.append(f"""
+                UPDATE rollup_post_activity SET {source} = {source} - 1
+                WHERE granularity = '{granularity}' AND bucket = strftime('{fmt}', OLD.created_at)
+                  AND post_id = OLD.post_id;""")
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{source}_delete_rollup
+        AFTER DELETE ON {source}
+        WHEN OLD.id <= (SELECT last_id FROM rollup_watermarks WHERE source = '{source}')
+        BEGIN{"".join(updates)}
+        END""")
+
+# Okno -> (granularność, modyfikator daty początku okna)
+ANALYTICS_WINDOWS = {
+    "24h": ("hour", "-23 hours"),
+    "7d": ("day", "-6 days"),
+    "30d": ("day", "-29 days"),
+}
+
+# Rollupy godzinowe są potrzebne tylko dla krótkich okien
+HOURLY_ROLLUP_RETENTION = "-7 days"
+
+# Rollupy odświeża wątek w tle co ROLLUP_REFRESH_INTERVAL sekund, a jedna
+# transakcja obejmuje najwyżej ROLLUP_BATCH nowych id na tabelę - zaległości
+# po dużym załadunku nie blokują zapisów na długo.
+ROLLUP_REFRESH_INTERVAL = 30
+ROLLUP_BATCH = 50_000
+
+_rollup_refresher = None
+_rollup_refresher_lock = threading.Lock()
+_rollup_pending = True
+
+def refresh_rollups(batch=ROLLUP_BATCH):
+    # Zwraca True, gdy zostały jeszcze nieprzetworzone wiersze
+    # Przy shardach rankingi okienkowe liczone są wprost z shardów
+    if SHARDING_ENABLED:
+        return False
+    pending = False
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for source in ("posts", "comments", "likes"):
+            cursor.execute("SELECT last_id FROM rollup_watermarks WHERE source = ?", (source,))
+            row = cursor.fetchone()
+            last_id = row[0] if row else 0
+            cursor.execute(f"SELECT MAX(id) FROM {source}")
+            max_id = cursor.fetchone()[0]
+            if max_id is None or max_id <= last_id:
+                continue
+            if max_id > last_id + batch:
+                max_id = last_id + batch
+                pending = True
+            for granularity, fmt in ROLLUP_GRANULARITIES.items():
+                cursor.execute(f"""
+                INSERT INTO rollup_user_activity (granularity, bucket, user_id, {source})
+                SELECT ?, strftime(?, created_at), user_id, COUNT(*)
+                FROM {source}
+                WHERE id > ? AND id <= ?
+                GROUP BY 2, 3
+                ON CONFLICT (granularity, bucket, user_id)
+                DO UPDATE SET {source} = {source} + excluded.{source}
+                """, (granularity, fmt, last_id, max_id))
+                if source != "posts":
+                    cursor.execute(f"""
+                    INSERT INTO rollup_post_activity (granularity, bucket, post_id, {source})
+                    SELECT ?, strftime(?, created_at), post_id, COUNT(*)
+                    FROM {source}
+                    WHERE id > ? AND id <= ?
+                    GROUP BY 2, 3
+                    ON CONFLICT (granularity, bucket, post_id)
+                    DO UPDATE SET {source} = {source} + excluded.{source}
+                    """, (granularity, fmt, last_id, max_id))
+            cursor.execute("""
+            INSERT INTO rollup_watermarks (source, last_id) VALUES (?, ?)
+            ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id
+            """, (source, max_id))
+        hour_fmt = ROLLUP_GRANULARITIES["hour"]
+        for table in ("rollup_user_activity", "rollup_post_activity"):
+            cursor.execute(f"""
+            DELETE FROM {table}
+            WHERE granularity = 'hour' AND bucket < strftime(?, 'now', ?)
+            """, (hour_fmt, HOURLY_ROLLUP_RETENTION))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"⚠ Błąd podczas odświeżania rollupów: {e}")
+        pending = False
+    conn.close()
+    return pending
+
+def start_rollup_refresher(interval=ROLLUP_REFRESH_INTERVAL):
+    global _rollup_refresher
+    if _rollup_refresher is not None or SHARDING_ENABLED:
+        return
+    def loop():
+        global _rollup_pending
+        while True:
+            # Zaległości nadrabiamy paczkami, każda we własnej transakcji
+            while refresh_rollups():
+                pass
+            _rollup_pending = False
+            time.sleep(interval)
+
+    with _rollup_refresher_lock:
+        if _rollup_refresher is None:
+            _rollup_refresher = threading.Thread(target=loop, name="rollup-refresher", daemon=True)
+            _rollup_refresher.start()
+
+def rollups_pending():
+    # True do zakończenia pierwszego pełnego nadrabiania rollupów
+    return _rollup_pending and not SHARDING_ENABLED
+
+# Rollupy odświeża refresh_rollups na bazie głównej - repliki mogą ich
+# jeszcze nie mieć, więc rankingi okienkowe czytamy z głównej
+def _window_bounds(window):
+    if window not in ANALYTICS_WINDOWS:
+        raise ValueError(f"Nieznane okno czasowe: {window}")
+    granularity, modifier = ANALYTICS_WINDOWS[window]
+    return granularity, ROLLUP_GRANULARITIES[granularity], modifier
+
+def _window_since(window):
+    # Początek okna w formacie created_at - ta sama granica co kubełki rollupów
+    _, fmt, modifier = _window_bounds(window)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT strftime(?, 'now', ?)", (fmt, modifier))
+    since = cursor.fetchone()[0]
+    conn.close()
+    return since
+
+def get_user_post_counts_window(window, limit=DEFAULT_TOP_LIMIT):
+    if SHARDING_ENABLED:
+        return _get_shards().get_user_post_counts(limit, since=_window_since(window))
+    granularity, fmt, modifier = _window_bounds(window)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
-    SELECT posts.id, posts.content, users.username, COUNT(comments.id) AS comment_count
-    FROM posts
+    SELECT users.username, SUM(r.posts) AS post_count
+    FROM rollup_user_activity r
+    JOIN users ON r.user_id = users.id
+    WHERE r.granularity = ? AND r.bucket >= strftime(?, 'now', ?)
+    GROUP BY r.user_id
+    HAVING post_count > 0
+    ORDER BY post_count DESC, r.user_id
+    LIMIT ?
+    """, (granularity, fmt, modifier, limit))
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def get_most_commented_posts_window(window, limit=DEFAULT_TOP_LIMIT):
+    if SHARDING_ENABLED:
+        return _get_shards().get_most_commented_posts(limit, since=_window_since(window))
+    granularity, fmt, modifier = _window_bounds(window)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT posts.id, posts.content, users.username, SUM(r.comments) AS comment_count
+    FROM rollup_post_activity r
+    JOIN posts ON r.post_id = posts.id
     JOIN users ON posts.user_id = users.id
-    LEFT JOIN comments ON posts.id = comments.post_id
-    GROUP BY posts.id
+    WHERE r.granularity = ? AND r.bucket >= strftime(?, 'now', ?)
+    GROUP BY r.post_id
     HAVING comment_count > 0
-    ORDER BY comment_count DESC
-    """)
+    ORDER BY comment_count DESC, r.post_id
+    LIMIT ?
+    """, (granularity, fmt, modifier, limit))
     results = cursor.fetchall()
     conn.close()
     return results
 
-def get_top_likers():
+def get_top_likers_window(window, limit=DEFAULT_TOP_LIMIT):
+    if SHARDING_ENABLED:
+        return _get_shards().get_top_likers(limit, since=_window_since(window))
+    granularity, fmt, modifier = _window_bounds(window)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
-    SELECT users.username, COUNT(likes.id) AS like_count
-    FROM users
-    JOIN likes ON users.id = likes.user_id
-    GROUP BY users.id
+    SELECT users.username, SUM(r.likes) AS like_count
+    FROM rollup_user_activity r
+    JOIN users ON r.user_id = users.id
+    WHERE r.granularity = ? AND r.bucket >= strftime(?, 'now', ?)
+    GROUP BY r.user_id
     HAVING like_count > 0
-    ORDER BY like_count DESC
-    """)
+    ORDER BY like_count DESC, r.user_id
+    LIMIT ?
+    """, (granularity, fmt, modifier, limit))
     results = cursor.fetchall()
     conn.close()
     return results
 
-def get_logs():
+# Przybliżona analityka: szkice (sketches.py) aktualizowane w add_like,
+# add_comment i log_event. Każdy proces zbiera własne zmiany w `_sketch_delta`,
+# a wątek w tle co SKETCH_PERSIST_INTERVAL sekund scala je z zapisanym stanem
+# w tabeli `sketches` (w jednej transakcji), więc procesy nie nadpisują sobie
+# stanu. Brak zapisanego stanu uruchamia przebudowę w tle; do jej zakończenia
+# zmiany nie są zliczane (przebudowa na koniec dobiera wiersze dodane w trakcie),
+# a zapytania przybliżone zwracają puste wyniki. Stan ma kilkaset KB, więc
+# bez nowych zmian (`_sketch_dirty`) zapis jest pomijany.
+SKETCHES_ENABLED = True
+SKETCH_PERSIST_INTERVAL = 30
+SKETCH_SCAN_BATCH = 10_000
+
+_sketch_lock = threading.RLock()
+_sketches = None
+_sketch_delta = None
+_sketch_dirty = False
+_sketch_rebuilding = False
+_sketch_generation = 0
+_sketch_persister = None
+
+def _load_sketches():
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, event, details, created_at FROM logs ORDER BY created_at DESC")
-    logs = cursor.fetchall()
+    cursor.execute("SELECT state FROM sketches WHERE name = 'analytics'")
+    row = cursor.fetchone()
+    conn.close()
+    if row:
+        return sketches.ApproximateAnalytics.from_state(json.loads(row["state"]))
+    return None
+
+def _scan_sketch_rows(approx, cursor, after=(0, 0, 0)):
+    # Zwraca największe przetworzone id (likes, comments, logs). Czytamy
+    # paczkami po id - między paczkami nie trzymamy blokady odczytu, więc
+    # bez WAL (baza w pamięci) zapisy nie czekają na cały skan.
+    last = list(after)
+    scans = (
+        ("SELECT id, user_id, post_id FROM likes", lambda row: approx.record_like(row["user_id"], row["post_id"])),
+        ("SELECT id, user_id, post_id FROM comments", lambda row: approx.record_comment(row["user_id"], row["post_id"])),
+        ("SELECT id, event, details, created_at FROM logs", lambda row: approx.record_log(dict(row))),
+    )
+    for index, (query, record) in enumerate(scans):
+        while True:
+            cursor.execute(f"{query} WHERE id > ? ORDER BY id LIMIT ?", (last[index], SKETCH_SCAN_BATCH))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                record(row)
+            last[index] = rows[-1]["id"]
+    return tuple(last)
+
+def rebuild_sketches():
+    # Pełny przebieg po likes/comments/logs - do uruchamiania poza ścieżką
+    # żądań (db_setup.py, wątek w tle z start_sketch_rebuild)
+    global _sketches, _sketch_delta, _sketch_dirty
+    approx = sketches.ApproximateAnalytics()
+    with _sketch_lock:
+        generation = _sketch_generation
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    scanned = _scan_sketch_rows(approx, cursor)
+    with _sketch_lock:
+        _scan_sketch_rows(approx, cursor, scanned)
+        state = json.dumps(approx.state())
+        cursor.execute("""
+        INSERT INTO sketches (name, state) VALUES ('analytics', ?)
+        ON CONFLICT (name) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP
+        """, (state,))
+        conn.commit()
+        if generation == _sketch_generation:
+            _sketches = approx
+            _sketch_delta = sketches.ApproximateAnalytics()
+            _sketch_dirty = False
+    conn.close()
+    return approx
+
+def start_sketch_rebuild():
+    global _sketch_rebuilding
+    with _sketch_lock:
+        if _sketch_rebuilding:
+            return False
+        _sketch_rebuilding = True
+        generation = _sketch_generation
+
+    def run():
+        global _sketch_rebuilding
+        try:
+            rebuild_sketches()
+            print("🧮 Przebudowano szkice przybliżonej analityki.")
+        except sqlite3.Error as e:
+            print(f"⚠ Błąd: Nie udało się przebudować szkiców! ({e})")
+        finally:
+            with _sketch_lock:
+                if generation == _sketch_generation:
+                    _sketch_rebuilding = False
+
+    threading.Thread(target=run, name="sketch-rebuild", daemon=True).start()
+    return True
+
+def _get_sketches():
+    # None = szkice niedostępne (trwa przebudowa w tle)
+    global _sketches, _sketch_delta, _sketch_dirty
+    with _sketch_lock:
+        if _sketches is None and not _sketch_rebuilding:
+            _sketches = _load_sketches()
+            if _sketches is None:
+                start_sketch_rebuild()
+            else:
+                _sketch_delta = sketches.ApproximateAnalytics()
+                _sketch_dirty = False
+        return _sketches
+
+def _ensure_sketch_persister():
+    global _sketch_persister
+    if _sketch_persister is None:
+        def loop():
+            while True:
+                time.sleep(SKETCH_PERSIST_INTERVAL)
+                persist_sketches()
+
+        _sketch_persister = threading.Thread(target=loop, name="sketch-persister", daemon=True)
+        _sketch_persister.start()
+        atexit.register(persist_sketches)
+
+def _record_sketch(update):
+    global _sketch_dirty
+    if not SKETCHES_ENABLED:
+        return
+    with _sketch_lock:
+        approx = _get_sketches()
+        if approx is None:
+            return
+        update(approx)
+        update(_sketch_delta)
+        _sketch_dirty = True
+        _ensure_sketch_persister()
+
+def persist_sketches():
+    # Scala lokalne zmiany z zapisanym stanem; widok procesu staje się wynikiem
+    # scalenia, czyli obejmuje też zmiany innych procesów
+    global _sketches, _sketch_delta, _sketch_dirty
+    with _sketch_lock:
+        if _sketches is None or _sketch_delta is None or not _sketch_dirty:
+            return
+        delta, _sketch_delta = _sketch_delta, sketches.ApproximateAnalytics()
+        _sketch_dirty = False
+        generation = _sketch_generation
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT state FROM sketches WHERE name = 'analytics'")
+        row = cursor.fetchone()
+        if row is None:
+            # Stan usunięty (np. przez db_setup.py) - delta sama nie wystarczy
+            conn.rollback()
+            conn.close()
+            with _sketch_lock:
+                if generation == _sketch_generation:
+                    _sketches = None
+            return
+        merged = sketches.ApproximateAnalytics.from_state(json.loads(row["state"])).merge(delta)
+        cursor.execute("UPDATE sketches SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE name = 'analytics'",
+                       (json.dumps(merged.state()),))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        conn.close()
+        with _sketch_lock:
+            if generation == _sketch_generation and _sketch_delta is not None:
+                _sketch_delta = delta.merge(_sketch_delta)
+                _sketch_dirty = True
+        print(f"⚠ Błąd podczas zapisu szkiców: {e}")
+        return
     conn.close()
-    return logs
+    with _sketch_lock:
+        if generation == _sketch_generation and _sketch_delta is not None:
+            _sketches = merged.merge(_sketch_delta)
+
+def _post_details(post_ids):
+    if not post_ids:
+        return {}
+    if SHARDING_ENABLED:
+        return _get_shards().post_details(post_ids)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in post_ids)
+    cursor.execute(f"""
+    SELECT posts.id, posts.content, users.username
+    FROM posts
+    JOIN users ON posts.user_id = users.id
+    WHERE posts.id IN ({placeholders})
+    """, list(post_ids))
+    details = {row["id"]: row for row in cursor.fetchall()}
+    conn.close()
+    return details
+
+def _usernames(user_ids):
+    if not user_ids:
+        return {}
+    if SHARDING_ENABLED:
+        return _get_shards().usernames(user_ids)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in user_ids)
+    cursor.execute(f"SELECT id, username FROM users WHERE id IN ({placeholders})", list(user_ids))
+    names = {row["id"]: row["username"] for row in cursor.fetchall()}
+    conn.close()
+    return names
+
+def get_most_commented_posts_approx(limit=DEFAULT_TOP_LIMIT):
+    with _sketch_lock:
+        approx = _get_sketches()
+        top = approx.commented_posts.top(limit) if approx is not None else []
+    details = _post_details([post_id for post_id, _ in top])
+    return [{"id": post_id, "content": details[post_id]["content"],
+             "username": details[post_id]["username"], "comment_count": count}
+            for post_id, count in top if post_id in details]
+
+def get_most_liked_posts_approx(limit=DEFAULT_TOP_LIMIT):
+    with _sketch_lock:
+        approx = _get_sketches()
+        top = [(post_id, count, approx.distinct_likers(post_id))
+               for post_id, count in approx.liked_posts.top(limit)] if approx is not None else []
+    details = _post_details([post_id for post_id, _, _ in top])
+    return [{"id": post_id, "content": details[post_id]["content"],
+             "username": details[post_id]["username"], "like_count": count,
+             "distinct_likers": distinct}
+            for post_id, count, distinct in top if post_id in details]
+
+def get_top_likers_approx(limit=DEFAULT_TOP_LIMIT):
+    with _sketch_lock:
+        approx = _get_sketches()
+        top = approx.likers.top(limit) if approx is not None else []
+    names = _usernames([user_id for user_id, _ in top])
+    return [{"username": names[user_id], "like_count": count}
+            for user_id, count in top if user_id in names]
+
+def get_logs_sample(limit=None):
+    with _sketch_lock:
+        approx = _get_sketches()
+        entries = list(approx.log_sample.items) if approx is not None else []
+    entries.sort(key=lambda entry: (entry["created_at"], entry["id"]), reverse=True)
+    return entries if limit is None else entries[:limit]
+
+def get_sketch_summary():
+    with _sketch_lock:
+        approx = _get_sketches()
+        if approx is None:
+            return None
+        return {
+            "likes_seen": approx.liked_posts.sketch.total,
+            "comments_seen": approx.commented_posts.sketch.total,
+            "like_error_bound": approx.liked_posts.sketch.error_bound(),
+            "comment_error_bound": approx.commented_posts.sketch.error_bound(),
+            "distinct_likers": approx.all_likers.count(),
+            "logs_seen": approx.log_sample.seen,
+        }
 
 def delete_inactive_users():
+    if SHARDING_ENABLED:
+        deleted = _get_shards().delete_inactive_users()
+        print(f"🗑 Usunięto nieaktywnych użytkowników (bez postów) ze shardów: {deleted}.")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE id NOT IN (SELECT DISTINCT user_id FROM posts)")
+    cursor.execute("""
+    DELETE FROM users WHERE id NOT IN (SELECT DISTINCT user_id FROM posts)
+    RETURNING id, username
+    """)
+    deleted = [tuple(row) for row in cursor.fetchall()]
     conn.commit()
     conn.close()
+    _identity.discard_users(deleted)
     print("🗑 Usunięto nieaktywnych użytkowników (bez postów).")
 
 def delete_old_posts():
+    if SHARDING_ENABLED:
+        deleted = _get_shards().delete_old_posts()
+        print(f"🗑 Usunięto stare posty (starsze niż 30 dni) ze shardów: {deleted}.")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM posts WHERE created_at < DATETIME('now', '-30 days')")
+    cursor.execute("DELETE FROM posts WHERE created_at < DATETIME('now', '-30 days') RETURNING id")
+    deleted = [row[0] for row in cursor.fetchall()]
     conn.commit()
     conn.close()
+    _identity.discard_posts(deleted)
+    _invalidate_hot_posts()
     print("🗑 Usunięto stare posty (starsze niż 30 dni).")
 
 def delete_orphan_comments():
+    if SHARDING_ENABLED:
+        deleted = _get_shards().delete_orphans("comments")
+        print(f"🗑 Usunięto osierocone komentarze ze shardów: {deleted}.")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM comments WHERE post_id NOT IN (SELECT id FROM posts WHERE id IS NOT NULL)")
@@ -302,6 +1756,10 @@ def delete_orphan_comments():
     print("🗑 Usunięto osierocone komentarze.")
 
 def delete_orphan_likes():
+    if SHARDING_ENABLED:
+        deleted = _get_shards().delete_orphans("likes")
+        print(f"🗑 Usunięto osierocone polubienia ze shardów: {deleted}.")
+        return
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM likes WHERE post_id NOT IN (SELECT id FROM posts)")
@@ -317,76 +1775,205 @@ def optimize_database():
     conn.close()
     print("🛠 Wykonano optymalizację bazy danych (VACUUM).")
 
-def export_users():
-    conn = get_db_connection()
+BACKUP_DIR = "backups"
+BACKUP_KEEP = 7
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+_last_backup = None
+_backup_error = None
+_backup_running = False
+_backup_lock = threading.Lock()
+
+def backup_database():
+    global _last_backup, _backup_error
+    import backup
+    try:
+        if get_backend().path is None:
+            raise OSError("Kopia zapasowa wymaga bazy danych w pliku")
+        _last_backup = backup.create_backup(get_backend().path, backends.resolve_path(BACKUP_DIR),
+                                            BACKUP_KEEP, BACKUP_PAGES, BACKUP_SLEEP)
+        _backup_error = None
+        print(f"💾 Utworzono kopię zapasową {_last_backup['path']} "
+              f"({_last_backup['copy_seconds']:.3f} s, {_last_backup['throughput_mb_s'] or 0:.1f} MB/s).")
+    except (sqlite3.Error, OSError) as e:
+        _backup_error = str(e)
+        print(f"⚠ Błąd: Nie udało się utworzyć kopii zapasowej! ({e})")
+
+def start_backup():
+    # Kopia w tle, żeby żądanie z /management nie czekało na kopiowanie.
+    # Wątek nie jest demonem: przerwany w trakcie zostawiłby niepełne archiwum.
+    global _backup_running
+    with _backup_lock:
+        if _backup_running:
+            return False
+        _backup_running = True
+
+    def run():
+        global _backup_running
+        try:
+            backup_database()
+        finally:
+            with _backup_lock:
+                _backup_running = False
+
+    threading.Thread(target=run, name="backup").start()
+    return True
+
+def get_backups():
+    import backup
+    return backup.list_backups(backends.resolve_path(BACKUP_DIR))
+
+def get_last_backup():
+    return _last_backup
+
+def get_backup_status():
+    return {"running": _backup_running, "last": _last_backup, "error": _backup_error}
+
+def _write_csv(filename, header, rows):
+    with open(filename, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print(f"📁 Eksportowano dane do {filename}!")
+
+def _export_query(filename, header, query):
+    conn = get_read_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, username, email, created_at FROM users")
+    cursor.execute(query)
     rows = cursor.fetchall()
-    with open("users.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["ID", "Username", "Email", "Created At"])
-        writer.writerows([(row['id'], row['username'], row['email'], row['created_at']) for row in rows])
+    _write_csv(filename, header, map(tuple, rows))
     conn.close()
-    print("📁 Eksportowano dane do users.csv!")
+
+def export_users():
+    header = ["ID", "Username", "Email", "Created At"]
+    if SHARDING_ENABLED:
+        _write_csv("users.csv", header, _get_shards().iter_users())
+        return
+    _export_query("users.csv", header, "SELECT id, username, email, created_at FROM users")
 
 def export_posts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    header = ["Post ID", "Username", "Content", "Created At"]
+    if SHARDING_ENABLED:
+        _write_csv("posts.csv", header, _get_shards().iter_posts())
+        return
+    _export_query("posts.csv", header, """
     SELECT posts.id, users.username, posts.content, posts.created_at 
     FROM posts 
     JOIN users ON posts.user_id = users.id
     """)
-    rows = cursor.fetchall()
-    with open("posts.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Post ID", "Username", "Content", "Created At"])
-        writer.writerows([(row['id'], row['username'], row['content'], row['created_at']) for row in rows])
-    conn.close()
-    print("📁 Eksportowano dane do posts.csv!")
 
 def export_comments():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    header = ["Comment ID", "Username", "Post Content", "Comment Content", "Created At"]
+    if SHARDING_ENABLED:
+        _write_csv("comments.csv", header, _get_shards().iter_comments())
+        return
+    _export_query("comments.csv", header, """
     SELECT comments.id, users.username, posts.content AS post_content, comments.content, comments.created_at 
     FROM comments 
     JOIN users ON comments.user_id = users.id 
     JOIN posts ON comments.post_id = posts.id
     """)
-    rows = cursor.fetchall()
-    with open("comments.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Comment ID", "Username", "Post Content", "Comment Content", "Created At"])
-        writer.writerows([(row['id'], row['username'], row['post_content'], row['content'], row['created_at']) for row in rows])
-    conn.close()
-    print("📁 Eksportowano dane do comments.csv!")
 
 def export_likes():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    header = ["Like ID", "Username", "Post Content", "Created At"]
+    if SHARDING_ENABLED:
+        _write_csv("likes.csv", header, _get_shards().iter_likes())
+        return
+    _export_query("likes.csv", header, """
     SELECT likes.id, users.username, posts.content, likes.created_at 
     FROM likes 
     JOIN users ON likes.user_id = users.id 
     JOIN posts ON likes.post_id = posts.id
     """)
-    rows = cursor.fetchall()
-    with open("likes.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Like ID", "Username", "Post Content", "Created At"])
-        writer.writerows([(row['id'], row['username'], row['content'], row['created_at']) for row in rows])
-    conn.close()
-    print("📁 Eksportowano dane do likes.csv!")
 
 def export_logs():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, event, details, created_at FROM logs")
-    rows = cursor.fetchall()
-    with open("logs.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Log ID", "Event", "Details", "Created At"])
-        writer.writerows([(row['id'], row['event'], row['details'], row['created_at']) for row in rows])
-    conn.close()
-    print("📁 Eksportowano dane do logs.csv!")
\ No newline at end of file
+    _export_query("logs.csv", ["Log ID", "Event", "Details", "Created At"],
+                  "SELECT id, event, details, created_at FROM logs")
+
+# Eksport przyrostowy: tylko wiersze o id większym niż znacznik z manifestu
+EXPORT_DIR = "exports"
+EXPORT_MAX_BYTES = 64 * 1024 * 1024
+EXPORT_PARTITION = "date"
+DELTA_EXPORTS = {
+    "users": (["ID", "Username", "Email", "Created At"], """
+    SELECT id, username, email, created_at FROM users
+    WHERE id > ? ORDER BY id
+    """),
+    "posts": (["Post ID", "Username", "Content", "Created At"], """
+    SELECT posts.id, users.username, posts.content, posts.created_at
+    FROM posts
+    JOIN users ON posts.user_id = users.id
+    WHERE posts.id > ? ORDER BY posts.id
+    """),
+    "comments": (["Comment ID", "Username", "Post Content", "Comment Content", "Created At"], """
+    SELECT comments.id, users.username, posts.content AS post_content, comments.content, comments.created_at
+    FROM comments
+    JOIN users ON comments.user_id = users.id
+    JOIN posts ON comments.post_id = posts.id
+    WHERE comments.id > ? ORDER BY comments.id
+    """),
+    "likes": (["Like ID", "Username", "Post Content", "Created At"], """
+    SELECT likes.id, users.username, posts.content, likes.created_at
+    FROM likes
+    JOIN users ON likes.user_id = users.id
+    JOIN posts ON likes.post_id = posts.id
+    WHERE likes.id > ? ORDER BY likes.id
+    """),
+    "logs": (["Log ID", "Event", "Details", "Created At"], """
+    SELECT id, event, details, created_at FROM logs
+    WHERE id > ? ORDER BY id
+    """),
+}
+
+_export_lock = threading.Lock()
+
+def _get_exporter():
+    import delta_export
+    return delta_export.DeltaExporter(backends.resolve_path(EXPORT_DIR), EXPORT_MAX_BYTES, EXPORT_PARTITION)
+
+def _iter_export_rows(cursor):
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            return
+        yield from map(tuple, rows)
+
+def export_delta(tables=None):
+    exporter = _get_exporter()
+    summary = {}
+    with _export_lock:
+        manifest = exporter.load_manifest()
+        conn = get_read_connection()
+        try:
+            for table in tables or DELTA_EXPORTS:
+                # Id z bloków shardów nie rosną monotonicznie między procesami -
+                # znacznik "id > ostatnie" mógłby pominąć wiersze
+                if SHARDING_ENABLED and table in SHARDED_TABLES:
+                    print(f"⚠ Eksport przyrostowy {table} pominięty - tabela jest shardowana, użyj pełnego eksportu CSV.")
+                    continue
+                header, query = DELTA_EXPORTS[table]
+                watermark = manifest["tables"].get(table, {}).get("watermark", 0)
+                cursor = conn.cursor()
+                cursor.execute(query, (watermark,))
+                written, files = exporter.write(manifest, table, header, _iter_export_rows(cursor))
+                summary[table] = written
+                if written:
+                    print(f"📁 Eksport przyrostowy {table}: {written} wierszy -> {', '.join(files)}")
+            exporter.save_manifest(manifest)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠ Błąd: Eksport przyrostowy nie powiódł się! ({e})")
+            return None
+        finally:
+            conn.close()
+    return summary
+
+def get_export_status():
+    manifest = _get_exporter().load_manifest()
+    status = []
+    for table in DELTA_EXPORTS:
+        info = manifest["tables"].get(table, {"watermark": 0, "files": []})
+        status.append({"table": table, "watermark": info["watermark"], "files": len(info["files"]),
+                       "rows": sum(entry["rows"] for entry in info["files"]),
+                       "bytes": sum(entry["bytes"] for entry in info["files"])})
+    return status
@@ -0,0 +1,91 @@
+# delta_export.py
+# Eksport przyrostowy do CSV: wiersze dopisywane są do plików rotowanych
+# według dnia (kolumna created_at) i/lub rozmiaru, a manifest.json opisuje
+# wszystkie wyprodukowane pliki (liczba wierszy, zakres id, rozmiar).
+# Wiersz musi mieć id na pierwszej pozycji i created_at na ostatniej.
+# Znacznik (watermark) każdej tabeli - ostatnie wyeksportowane id - jest
+# przechowywany w manifeście razem z rozmiarami plików; przy dopisywaniu plik
+# jest przycinany do rozmiaru z manifestu, więc przerwany eksport nie
+# zostawia zdublowanych wierszy.
+import csv
+import json
+import os
+import time
+
+PARTITIONS = ("date", "size")
+
+class DeltaExporter:
+    def __init__(self, out_dir, max_bytes=64 * 1024 * 1024, partition="date"):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Nieznany podział plików: {partition}")
+        self.out_dir = out_dir
+        self.max_bytes = max_bytes
+        self.partition = partition
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.out_dir, "manifest.json")
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"tables": {}}
+
+    def save_manifest(self, manifest):
+        manifest["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partition_key(self, row):
+        return str(row[-1])[:10] if self.partition == "date" else "all"
+
+    def _open_entry(self, files, table, key):
+        # Dopisujemy do ostatniej części danej partycji, dopóki nie przekroczy max_bytes
+        parts = [entry for entry in files if entry["partition"] == key]
+        if parts and parts[-1]["bytes"] < self.max_bytes:
+            return parts[-1]
+        part = len(parts) + 1
+        name = f"{table}-{part:05d}.csv" if key == "all" else f"{table}-{key}-{part:04d}.csv"
+        entry = {"path": os.path.join(table, name), "partition": key, "rows": 0,
+                 "bytes": 0, "first_id": None, "last_id": None}
+        files.append(entry)
+        return entry
+
+    def write(self, manifest, table, header, rows):
+        table_info = manifest["tables"].setdefault(table, {"watermark": 0, "files": []})
+        os.makedirs(os.path.join(self.out_dir, table), exist_ok=True)
+        written = 0
+        touched = []
+        entry = file = writer = None
+        try:
+            for row in rows:
+                key = self._partition_key(row)
+                if entry is None or entry["partition"] != key or entry["bytes"] >= self.max_bytes:
+                    if file is not None:
+                        file.close()
+                        entry["bytes"] = os.path.getsize(os.path.join(self.out_dir, entry["path"]))
+                    entry = self._open_entry(table_info["files"], table, key)
+                    path = os.path.join(self.out_dir, entry["path"])
+                    file = open(path, "a", newline="", encoding="utf-8")
+                    file.truncate(entry["bytes"])
+                    writer = csv.writer(file)
+                    if entry["rows"] == 0:
+                        writer.writerow(header)
+                    if entry["path"] not in touched:
+                        touched.append(entry["path"])
+                writer.writerow(row)
+                entry["rows"] += 1
+                entry["first_id"] = entry["first_id"] or row[0]
+                entry["last_id"] = row[0]
+                entry["bytes"] = file.tell()
+                table_info["watermark"] = row[0]
+                written += 1
+        finally:
+            if file is not None:
+                file.close()
+                entry["bytes"] = os.path.getsize(os.path.join(self.out_dir, entry["path"]))
+        return written, touched
@@ -0,0 +1,146 @@
+# gateway.py
+# Bramka zapisów dla ruchu "burstowego": żądania trafiają do ograniczonej
+# kolejki, a wątek roboczy co `interval` sekund (lub po `max_batch`
+# operacjach) zapisuje całą paczkę jedną transakcją przez `commit_fn(ops)`
+# (group commit) - zamiast wielu konkurujących o blokadę zapisu transakcji.
+# Pełna kolejka lub zbyt długie oczekiwanie kończy się wyjątkiem Overloaded
+# (HTTP 503), a limity token bucket na użytkownika/IP - HTTP 429.
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+class Overloaded(Exception):
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        # 0 = zgoda, w przeciwnym razie liczba sekund do uzbierania żetonu
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    # Kubełek na klucz (id użytkownika, adres IP); najdawniej używane kubełki
+    # są usuwane po przekroczeniu max_keys - pełny kubełek i tak niczego nie blokuje.
+    def __init__(self, rate, burst, max_keys=10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            retry_after = bucket.take(now)
+            if retry_after:
+                self.limited += 1
+            return retry_after
+
+class _Pending:
+    __slots__ = ("op", "done", "result", "error")
+
+    def __init__(self, op):
+        self.op = op
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class WriteGateway:
+    def __init__(self, commit_fn, interval=0.005, max_batch=256, max_queue=2000, timeout=5.0):
+        self.commit_fn = commit_fn
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="write-gateway", daemon=True)
+                self._worker.start()
+
+    def submit(self, op, *args):
+        self._ensure_worker()
+        pending = _Pending((op, args))
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded("Kolejka zapisów jest pełna - spróbuj ponownie za chwilę.")
+        with self._lock:
+            self.submitted += 1
+        if not pending.done.wait(self.timeout):
+            # Operacja może jeszcze zostać zapisana - polubienia są idempotentne,
+            # ale ponowiony komentarz może się zdublować.
+            with self._lock:
+                self.timed_out += 1
+            raise Overloaded("Przekroczono czas oczekiwania na zapis.", self.timeout)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self.commit_fn([pending.op for pending in batch])
+            except Exception as e:
+                results = None
+                for pending in batch:
+                    pending.error = e
+            for index, pending in enumerate(batch):
+                if results is not None:
+                    pending.result = results[index]
+                pending.done.set()
+            with self._lock:
+                self.committed += len(batch)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        with self._lock:
+            return {"queued": self._queue.qsize(), "submitted": self.submitted,
+                    "committed": self.committed, "batches": self.batches,
+                    "largest_batch": self.largest_batch, "rejected": self.rejected,
+                    "timed_out": self.timed_out}
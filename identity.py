@@ -0,0 +1,160 @@
+# identity.py
+# Cache istnienia identyfikatorów dla ścieżki zapisu: bitmapy id użytkowników
+# i postów (1 bit na id) oraz LRU nazwa użytkownika -> id.
+# Trafienie pozwala pominąć SELECT sprawdzający istnienie wiersza; brak
+# trafienia zawsze weryfikujemy w bazie, bo wiersz mógł dodać inny proces.
+import threading
+from collections import OrderedDict
+
+class IdBitmap:
+    def __init__(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def add(self, item_id):
+        byte, bit = divmod(item_id, 8)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits))))
+        if not self.bits[byte] & (1 << bit):
+            self.bits[byte] |= 1 << bit
+            self.count += 1
+
+    def discard(self, item_id):
+        byte, bit = divmod(item_id, 8)
+        if byte < len(self.bits) and self.bits[byte] & (1 << bit):
+            self.bits[byte] &= ~(1 << bit)
+            self.count -= 1
+
+    def __contains__(self, item_id):
+        byte, bit = divmod(item_id, 8)
+        return 0 <= byte < len(self.bits) and bool(self.bits[byte] & (1 << bit))
+
+    def clear(self):
+        self.bits = bytearray()
+        self.count = 0
+
+class LRUCache:
+    def __init__(self, maxsize=10_000):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def discard(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class IdentityCache:
+    def __init__(self, username_cache_size=10_000):
+        self.users = IdBitmap()
+        self.posts = IdBitmap()
+        self.usernames = LRUCache(username_cache_size)
+        self.users_warm = False
+        self.posts_warm = False
+        self.lock = threading.Lock()
+        # Rozgrzewanie: bitmapy budowane są poza blokadą, a usunięcia w trakcie
+        # skanu zapamiętywane i odejmowane przy podmianie. Zmiana generation
+        # (invalidate) unieważnia rozgrzewanie w toku.
+        self.generation = 0
+        self._removed_users = None
+        self._removed_posts = None
+
+    def begin_warm(self):
+        with self.lock:
+            self._removed_users = set()
+            self._removed_posts = set()
+            return self.generation
+
+    def finish_warm(self, generation, users, posts):
+        with self.lock:
+            if generation != self.generation or self._removed_users is None:
+                return False
+            for user_id in self._removed_users:
+                users.discard(user_id)
+            for post_id in self._removed_posts:
+                posts.discard(post_id)
+            self.users, self.posts = users, posts
+            self.users_warm = self.posts_warm = True
+            self._removed_users = self._removed_posts = None
+            return True
+
+    def invalidate_users(self):
+        with self.lock:
+            self.generation += 1
+            self.users_warm = False
+            self.users.clear()
+            self.usernames.clear()
+
+    def invalidate_posts(self):
+        with self.lock:
+            self.generation += 1
+            self.posts_warm = False
+            self.posts.clear()
+
+    def discard_users(self, users):
+        # users: pary (id, nazwa) usuniętych użytkowników
+        with self.lock:
+            for user_id, username in users:
+                self.users.discard(user_id)
+                if self.usernames.get(username) == user_id:
+                    self.usernames.discard(username)
+                if self._removed_users is not None:
+                    self._removed_users.add(user_id)
+
+    def discard_posts(self, post_ids):
+        with self.lock:
+            for post_id in post_ids:
+                self.posts.discard(post_id)
+                if self._removed_posts is not None:
+                    self._removed_posts.add(post_id)
+
+    def has_user(self, user_id):
+        with self.lock:
+            return self.users_warm and user_id in self.users
+
+    def has_post(self, post_id):
+        with self.lock:
+            return self.posts_warm and post_id in self.posts
+
+    def add_user(self, user_id, username=None):
+        with self.lock:
+            if self.users_warm:
+                self.users.add(user_id)
+            if username is not None:
+                self.usernames.put(username, user_id)
+
+    def add_post(self, post_id):
+        with self.lock:
+            if self.posts_warm:
+                self.posts.add(post_id)
+
+    def user_id(self, username):
+        with self.lock:
+            return self.usernames.get(username)
+
+    def remember_username(self, username, user_id):
+        with self.lock:
+            self.usernames.put(username, user_id)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "users": self.users.count if self.users_warm else None,
+                "posts": self.posts.count if self.posts_warm else None,
+                "usernames": len(self.usernames),
+            }
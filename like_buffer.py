@@ -0,0 +1,50 @@
+# like_buffer.py
+# Bufor koalescujący polubienia: operacje like/unlike zebrane w oknie
+# `window` sekund są sprowadzane do stanu końcowego każdej pary
+# (user_id, post_id) - ostatnia operacja wygrywa - i zapisywane jedną
+# transakcją przez funkcję `flush_fn(changes)`.
+import threading
+
+class LikeBuffer:
+    def __init__(self, flush_fn, window=0.05, max_pending=1000):
+        self.flush_fn = flush_fn
+        self.window = window
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, user_id, post_id, liked=True):
+        with self._lock:
+            self._pending[(int(user_id), int(post_id))] = liked
+            self.submitted += 1
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                changes, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not changes:
+                return 0
+            self.flush_fn(changes)
+            self.flushed += len(changes)
+            self.batches += 1
+            return len(changes)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "submitted": self.submitted,
+                    "flushed": self.flushed, "batches": self.batches}
@@ -0,0 +1,33 @@
+# models.py
+# Lekkie, niemutowalne modele wierszy (namedtuple => brak __dict__, pola
+# w __slots__ krotki). Kolejność pól odpowiada kolumnom zapytań z database.py,
+# więc krotkę z kursora zamieniamy w model bez mapowania nazw kolumn.
+# Dostęp row['pole'] działa nadal, tak jak dla sqlite3.Row.
+from collections import namedtuple
+from functools import partial
+
+class _RowModel(tuple):
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._fields)
+
+def _model(name, fields):
+    base = namedtuple(name, fields)
+    return type(name, (_RowModel, base), {"__slots__": ()})
+
+User = _model("User", ["id", "username", "email", "created_at"])
+Post = _model("Post", ["id", "username", "content", "created_at"])
+Comment = _model("Comment", ["id", "username", "post_content", "content", "created_at"])
+Like = _model("Like", ["id", "username", "content", "created_at"])
+LogEntry = _model("LogEntry", ["id", "event", "details", "created_at"])
+
+def constructor(model):
+    # partial + tuple.__new__ działa w całości w C - szybciej niż row_factory
+    # napisany w Pythonie, wywoływany dla każdego wiersza.
+    return partial(tuple.__new__, model)
@@ -0,0 +1,218 @@
+# profiling.py
+# Opcjonalne profilowanie żądań: czas każdego żądania (do zamknięcia
+# odpowiedzi, także strumieniowanej) rozbity na zapytania do bazy, renderowanie
+# szablonów i serializację JSON, z percentylami per trasa dla /management/perf.
+# Część żądań (sample_rate) jest profilowana cProfile, a profile żądań
+# wolniejszych niż slow_ms trafiają do profile_dir (python -m pstats plik.prof).
+#
+# Czas bazy liczą połączenia TimedConnection (database.CONNECTION_FACTORY),
+# ale tylko w wątku obsługującym żądanie - zapisy wykonywane przez wątki w tle
+# (bramka zapisów, bufor polubień) widać jako czas "pozostały".
+import cProfile
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import before_render_template, request, template_rendered
+from flask.json.provider import DefaultJSONProvider
+
+import database
+
+_local = threading.local()
+
+def _add(key, elapsed):
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[key] += elapsed
+
+class TimedCursor(sqlite3.Cursor):
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            _add("db", time.perf_counter() - start)
+
+    def execute(self, *args):
+        return self._timed(super().execute, *args)
+
+    def executemany(self, *args):
+        return self._timed(super().executemany, *args)
+
+    def executescript(self, *args):
+        return self._timed(super().executescript, *args)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+class TimedConnection(database.backends.PooledConnection):
+    # Connection.execute w sqlite3 tworzy zwykły kursor z pominięciem cursor(),
+    # więc skróty kierujemy przez TimedCursor
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _add("db", time.perf_counter() - start)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            _add("serialize", time.perf_counter() - start)
+
+def _percentile(values, p):
+    # Metoda najbliższej rangi na posortowanej liście
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+class RequestProfiler:
+    def __init__(self, profile_dir="profiles", slow_ms=500, sample_rate=0.1, keep=20, window=1000):
+        self.profile_dir = database.backends.resolve_path(profile_dir)
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.window = window
+        self.enabled = False
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def install(self, app):
+        database.CONNECTION_FACTORY = TimedConnection
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+        self.enabled = True
+
+    def _start(self):
+        # Profil poprzedniego żądania, którego odpowiedź nigdy nie została zamknięta
+        previous = getattr(_local, "profile", None)
+        if previous is not None:
+            previous.disable()
+        _local.timings = None
+        _local.profile = None
+        if request.endpoint in (None, "static"):
+            return
+        _local.timings = {"db": 0.0, "template": 0.0, "serialize": 0.0}
+        _local.templates = []
+        if random.random() < self.sample_rate:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                _local.profile = profile
+            except ValueError:
+                # Inny profiler jest już aktywny w tym wątku
+                pass
+        _local.started = time.perf_counter()
+
+    def _before_render(self, sender, template, context, **extra):
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            _local.templates.append((time.perf_counter(), timings["db"]))
+
+    def _rendered(self, sender, template, context, **extra):
+        # Przy stream_template zapytania wykonują się w trakcie renderowania -
+        # odejmujemy je, żeby nie liczyć ich podwójnie
+        timings = getattr(_local, "timings", None)
+        if timings is not None and _local.templates:
+            start, db = _local.templates.pop()
+            timings["template"] += (time.perf_counter() - start) - (timings["db"] - db)
+
+    def _finish(self, response):
+        if getattr(_local, "timings", None) is None:
+            return response
+        route = f"{request.method} {request.url_rule.rule}"
+        endpoint = request.endpoint
+        # Odpowiedź strumieniowana jest generowana dopiero po powrocie z widoku
+        response.call_on_close(lambda: self._record(route, endpoint))
+        return response
+
+    def _record(self, route, endpoint):
+        timings = _local.timings
+        if timings is None:
+            return
+        total = time.perf_counter() - _local.started
+        profile = _local.profile
+        _local.timings = None
+        _local.profile = None
+        if profile is not None:
+            profile.disable()
+            if total * 1000 >= self.slow_ms:
+                self._save_profile(profile, endpoint, total)
+        sample = (total, timings["db"], timings["template"], timings["serialize"])
+        with self._lock:
+            samples = self._samples.get(route)
+            if samples is None:
+                samples = self._samples[route] = deque(maxlen=self.window)
+            samples.append(sample)
+
+    def _save_profile(self, profile, endpoint, total):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{total * 1000:.0f}ms.prof"
+            profile.dump_stats(os.path.join(self.profile_dir, name))
+            for old in self.profiles()[self.keep:]:
+                os.remove(os.path.join(self.profile_dir, old["name"]))
+        except OSError as e:
+            print(f"⚠ Błąd: Nie udało się zapisać profilu żądania! ({e})")
+
+    def profiles(self):
+        if not os.path.isdir(self.profile_dir):
+            return []
+        items = []
+        for name in os.listdir(self.profile_dir):
+            if name.endswith(".prof"):
+                stat = os.stat(os.path.join(self.profile_dir, name))
+                items.append({"name": name, "size": stat.st_size,
+                              "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))})
+        return sorted(items, key=lambda item: (item["created_at"], item["name"]), reverse=True)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {route: list(samples) for route, samples in self._samples.items()}
+        rows = []
+        for route, samples in snapshot.items():
+            totals = sorted(sample[0] for sample in samples)
+            count = len(samples)
+            db, template, serialize = (sum(sample[i] for sample in samples) / count for i in (1, 2, 3))
+            mean = sum(totals) / count
+            rows.append({"route": route, "count": count,
+                         "p50": _percentile(totals, 50) * 1000,
+                         "p95": _percentile(totals, 95) * 1000,
+                         "p99": _percentile(totals, 99) * 1000,
+                         "mean": mean * 1000, "db": db * 1000, "template": template * 1000,
+                         "serialize": serialize * 1000,
+                         "other": max(0.0, mean - db - template - serialize) * 1000})
+        return sorted(rows, key=lambda row: row["p95"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
@@ -0,0 +1,123 @@
+# replica.py
+# Kopia bazy tylko do odczytu odświeżana przez online backup API SQLite
+# (Connection.backup) w krokach po `pages` stron, z przerwą `sleep` między
+# krokami, więc kopiowanie nie blokuje zapisujących na długo.
+import os
+import sqlite3
+import threading
+import time
+
+def paced_copy(src_path, dst_path, pages=256, sleep=0.005):
+    # Kopiujemy do pliku tymczasowego i podmieniamy atomowo - czytelnicy
+    # zawsze widzą kompletną kopię, starą albo nową.
+    tmp_path = dst_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        # W trybie WAL trzymamy transakcję odczytu przez całą kopię: backup
+        # widzi jeden spójny snapshot i nie restartuje się po cudzych zapisach,
+        # a zapisujący nadal mogą commitować.
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        # sqlite3 usypia tylko przy SQLITE_BUSY, więc tempo kopiowania
+        # wyznaczamy sami przerwą po każdym kroku.
+        pause = (lambda status, remaining, total: time.sleep(sleep)) if sleep and pages > 0 else None
+        src.backup(dst, pages=pages, progress=pause)
+        # Kopia jest tylko do odczytu - bez WAL nie zostawia plików -wal/-shm,
+        # które po podmianie pliku nie pasowałyby do nowej zawartości.
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        if src.in_transaction:
+            src.rollback()
+        dst.close()
+        src.close()
+    os.replace(tmp_path, dst_path)
+
+def _modified_at(path):
+    mtimes = [os.path.getmtime(p) for p in (path, path + "-wal") if os.path.exists(p)]
+    return max(mtimes) if mtimes else 0.0
+
+class Replica:
+    def __init__(self, primary_path, replica_path=None, max_staleness=30, pages=256, sleep=0.005):
+        self.primary_path = primary_path
+        self.replica_path = replica_path or os.path.splitext(primary_path)[0] + ".replica.sqlite"
+        self.max_staleness = max_staleness
+        self.pages = pages
+        self.sleep = sleep
+        self.refreshed_at = None
+        self.source_mtime = None
+        self.last_duration = None
+        self.refresh_count = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._stop = threading.Event()
+
+    def refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        try:
+            source_mtime = _modified_at(self.primary_path)
+            started = time.time()
+            paced_copy(self.primary_path, self.replica_path, self.pages, self.sleep)
+            self.last_duration = time.time() - started
+            self.refreshed_at = started
+            self.source_mtime = source_mtime
+            self.refresh_count += 1
+            self.last_error = None
+            return True
+        except (sqlite3.Error, OSError) as e:
+            self.last_error = str(e)
+            return False
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh_async(self):
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def lag(self):
+        # Opóźnienie = czas od rozpoczęcia ostatniego odświeżenia, o ile baza
+        # główna zmieniła się od tego momentu; None gdy repliki jeszcze nie ma.
+        if self.refreshed_at is None or not os.path.exists(self.replica_path):
+            return None
+        if _modified_at(self.primary_path) <= self.source_mtime:
+            return 0.0
+        return max(0.0, time.time() - self.refreshed_at)
+
+    def connect(self, factory=sqlite3.Connection):
+        # Zwraca połączenie do repliki albo None, gdy replika jest starsza niż
+        # max_staleness (wtedy odświeżenie rusza w tle, a odczyt idzie do bazy głównej).
+        lag = self.lag()
+        if lag is None or lag > self.max_staleness:
+            self.refresh_async()
+            return None
+        return sqlite3.connect(f"file:{self.replica_path}?mode=ro", uri=True, factory=factory)
+
+    def start(self, interval):
+        def loop():
+            while not self._stop.wait(interval):
+                lag = self.lag()
+                if lag is None or lag > 0:
+                    self.refresh()
+        self._stop.clear()
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {
+            "path": self.replica_path,
+            "lag": self.lag(),
+            "max_staleness": self.max_staleness,
+            "last_duration": self.last_duration,
+            "refresh_count": self.refresh_count,
+            "refreshing": self._refreshing,
+            "last_error": self.last_error,
+        }
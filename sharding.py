@@ -0,0 +1,825 @@
+# sharding.py
+# Opcjonalny backend shardowany: użytkownik i wszystko, co utworzył (posty,
+# komentarze, polubienia), leży w pliku shard-{user_id % N}.sqlite, więc
+# zapisy różnych użytkowników rozkładają się na N niezależnych blokad zapisu.
+#
+# - Id są globalne: przydzielane blokami po ID_BLOCK z pliku meta.sqlite,
+#   dzięki czemu wiersz zachowuje id po przeniesieniu na inny shard.
+# - Unikalność nazw użytkowników i emaili pilnuje tabela directory w meta.
+# - Komentarz/polubienie leży na shardzie autora, a post, którego dotyczy,
+#   może leżeć gdzie indziej - klucze obce SQLite nie przekraczają granic
+#   plików, więc istnienie postu sprawdzamy w kodzie.
+# - Odczyty przekrojowe to równoległy scatter-gather (pula wątków, jedno
+#   zapytanie na shard) z łączeniem posortowanych wyników przez heapq.merge.
+#
+# Użycie:
+#   python sharding.py --dir shards --status
+#   python sharding.py --dir shards --import database.sqlite
+#   python sharding.py --dir shards --rebalance 8
+import argparse
+import glob
+import heapq
+import os
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+ID_BLOCK = 100
+SHARD_TABLES = ("users", "posts", "comments", "likes")
+
+SHARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS likes (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE (user_id, post_id)
+);
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS post_stats (
+    post_id INTEGER PRIMARY KEY,
+    comment_count INTEGER NOT NULL DEFAULT 0,
+    like_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    post_count INTEGER NOT NULL DEFAULT 0,
+    like_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_posts_user_id ON posts(user_id);
+CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts(created_at);
+CREATE INDEX IF NOT EXISTS idx_comments_user_id ON comments(user_id);
+CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
+CREATE INDEX IF NOT EXISTS idx_comments_created_at ON comments(created_at);
+CREATE INDEX IF NOT EXISTS idx_likes_post_id ON likes(post_id);
+CREATE INDEX IF NOT EXISTS idx_likes_created_at ON likes(created_at);
+CREATE INDEX IF NOT EXISTS idx_post_stats_comments ON post_stats(comment_count DESC, post_id);
+CREATE INDEX IF NOT EXISTS idx_user_stats_posts ON user_stats(post_count DESC, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_stats_likes ON user_stats(like_count DESC, user_id);
+"""
+
+# Liczniki jak post_stats/user_stats w database.py, ale lokalne dla shardu:
+# user_stats jest kompletne (posty i polubienia leżą na shardzie autora),
+# a post_stats liczy tylko komentarze i polubienia z tego shardu - suma po
+# shardach daje pełny licznik. Usunięcie postu nie rusza post_stats, bo
+# komentarze innych użytkowników na tym shardzie zostają.
+SHARD_STATS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_users_insert_stats AFTER INSERT ON users BEGIN
+    INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_users_delete_stats AFTER DELETE ON users BEGIN
+    DELETE FROM user_stats WHERE user_id = OLD.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_posts_insert_stats AFTER INSERT ON posts BEGIN
+    INSERT INTO user_stats (user_id, post_count) VALUES (NEW.user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET post_count = post_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_posts_delete_stats AFTER DELETE ON posts BEGIN
+    UPDATE user_stats SET post_count = post_count - 1 WHERE user_id = OLD.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_comments_insert_stats AFTER INSERT ON comments BEGIN
+    INSERT INTO post_stats (post_id, comment_count) VALUES (NEW.post_id, 1)
+    ON CONFLICT (post_id) DO UPDATE SET comment_count = comment_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_comments_delete_stats AFTER DELETE ON comments BEGIN
+    UPDATE post_stats SET comment_count = comment_count - 1 WHERE post_id = OLD.post_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_likes_insert_stats AFTER INSERT ON likes BEGIN
+    INSERT INTO post_stats (post_id, like_count) VALUES (NEW.post_id, 1)
+    ON CONFLICT (post_id) DO UPDATE SET like_count = like_count + 1;
+    INSERT INTO user_stats (user_id, like_count) VALUES (NEW.user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET like_count = like_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_likes_delete_stats AFTER DELETE ON likes BEGIN
+    UPDATE post_stats SET like_count = like_count - 1 WHERE post_id = OLD.post_id;
+    UPDATE user_stats SET like_count = like_count - 1 WHERE user_id = OLD.user_id;
+END;
+"""
+
+def _rebuild_shard_stats(conn):
+    conn.execute("DELETE FROM post_stats")
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("""
+    INSERT INTO post_stats (post_id, comment_count, like_count)
+    SELECT post_id, SUM(is_comment), SUM(1 - is_comment)
+    FROM (SELECT post_id, 1 AS is_comment FROM comments
+          UNION ALL
+          SELECT post_id, 0 FROM likes)
+    GROUP BY post_id
+    """)
+    conn.execute("""
+    INSERT INTO user_stats (user_id, post_count, like_count)
+    SELECT users.id,
+           (SELECT COUNT(*) FROM posts WHERE posts.user_id = users.id),
+           (SELECT COUNT(*) FROM likes WHERE likes.user_id = users.id)
+    FROM users
+    """)
+
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directory (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL
+);
+"""
+
+def _version_triggers():
+    # Te same liczniki wersji co w database.py - suma po shardach rośnie przy
+    # każdej zmianie, więc nadaje się na klucz cache fragmentów list.
+    statements = []
+    for table in SHARD_TABLES:
+        statements.append(f"INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}');")
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version
+            AFTER {operation} ON {table} BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END;""")
+    return "\n".join(statements)
+
+class ShardedStore:
+    def __init__(self, directory, shard_count=4):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, "meta.sqlite")
+        self._id_lock = threading.Lock()
+        self._id_blocks = {}
+        self._post_shards = {}
+        meta = self._connect_path(self.meta_path)
+        meta.executescript(META_SCHEMA)
+        meta.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('shard_count', ?)", (shard_count,))
+        meta.commit()
+        self.shard_count = meta.execute("SELECT value FROM settings WHERE name = 'shard_count'").fetchone()[0]
+        meta.close()
+        self._ensure_shards(self.shard_count)
+        self._pool = ThreadPoolExecutor(max_workers=min(self.shard_count, 8))
+
+    def _connect_path(self, path):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def shard_path(self, index):
+        return os.path.join(self.directory, f"shard-{index}.sqlite")
+
+    def _ensure_shards(self, count):
+        for index in range(count):
+            conn = sqlite3.connect(self.shard_path(index))
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Shardy sprzed wprowadzenia liczników dostają je przeliczone raz
+            stats_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'").fetchone()
+            conn.executescript(SHARD_SCHEMA + _version_triggers() + SHARD_STATS_TRIGGERS)
+            if not stats_exist:
+                _rebuild_shard_stats(conn)
+            conn.commit()
+            conn.close()
+
+    def shard_for(self, user_id):
+        return int(user_id) % self.shard_count
+
+    def connect(self, index):
+        return self._connect_path(self.shard_path(index))
+
+    def _scatter(self, query, params=()):
+        # Jedno zapytanie na każdy shard, równolegle; wynik: lista list wierszy
+        def run(index):
+            conn = self.connect(index)
+            try:
+                return conn.execute(query, params).fetchall()
+            finally:
+                conn.close()
+        return list(self._pool.map(run, range(self.shard_count)))
+
+    def next_id(self, name):
+        # Blok ID_BLOCK kolejnych id jednym zapisem do meta - inne procesy
+        # dostają rozłączne bloki, więc id pozostają unikalne globalnie.
+        with self._id_lock:
+            block = self._id_blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                meta = self._connect_path(self.meta_path)
+                try:
+                    meta.execute("INSERT OR IGNORE INTO sequences (name, next_id) VALUES (?, 1)", (name,))
+                    end = meta.execute("""
+                    UPDATE sequences SET next_id = next_id + ? WHERE name = ?
+                    RETURNING next_id
+                    """, (ID_BLOCK, name)).fetchone()[0]
+                    meta.commit()
+                finally:
+                    meta.close()
+                block = self._id_blocks[name] = [end - ID_BLOCK, end]
+            block[0] += 1
+            return block[0] - 1
+
+    # --- zapisy ---
+
+    def add_user(self, username, email):
+        meta = self._connect_path(self.meta_path)
+        user_id = self.next_id("users")
+        try:
+            meta.execute("INSERT INTO directory (user_id, username, email) VALUES (?, ?, ?)",
+                         (user_id, username, email))
+            conn = self.connect(self.shard_for(user_id))
+            try:
+                conn.execute("INSERT INTO users (id, username, email) VALUES (?, ?, ?)",
+                             (user_id, username, email))
+                conn.commit()
+            finally:
+                conn.close()
+            meta.commit()
+        finally:
+            if meta.in_transaction:
+                meta.rollback()
+            meta.close()
+        return user_id
+
+    def get_user_id(self, username):
+        meta = self._connect_path(self.meta_path)
+        row = meta.execute("SELECT user_id FROM directory WHERE username = ?", (username,)).fetchone()
+        meta.close()
+        return row["user_id"] if row else None
+
+    def _require_user(self, conn, user_id):
+        if conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is None:
+            raise ValueError(f"Użytkownik o ID {user_id} nie istnieje!")
+
+    def find_post_shard(self, post_id):
+        index = self._post_shards.get(post_id)
+        if index is not None:
+            return index
+        for index, rows in enumerate(self._scatter("SELECT 1 FROM posts WHERE id = ?", (post_id,))):
+            if rows:
+                self._post_shards[post_id] = index
+                return index
+        return None
+
+    def add_post(self, user_id, content):
+        conn = self.connect(self.shard_for(user_id))
+        try:
+            self._require_user(conn, user_id)
+            post_id = self.next_id("posts")
+            conn.execute("INSERT INTO posts (id, user_id, content) VALUES (?, ?, ?)", (post_id, user_id, content))
+            conn.commit()
+        finally:
+            conn.close()
+        self._post_shards[post_id] = self.shard_for(user_id)
+        return post_id
+
+    def add_comment(self, user_id, post_id, content):
+        if self.find_post_shard(post_id) is None:
+            raise ValueError(f"Post o ID {post_id} nie istnieje!")
+        conn = self.connect(self.shard_for(user_id))
+        try:
+            self._require_user(conn, user_id)
+            comment_id = self.next_id("comments")
+            conn.execute("INSERT INTO comments (id, user_id, post_id, content) VALUES (?, ?, ?, ?)",
+                         (comment_id, user_id, post_id, content))
+            conn.commit()
+        finally:
+            conn.close()
+        return comment_id
+
+    def apply_like_changes(self, changes):
+        # changes: {(user_id, post_id): True/False}; jedna transakcja na shard
+        by_shard = {}
+        for (user_id, post_id), liked in changes.items():
+            by_shard.setdefault(self.shard_for(user_id), []).append((user_id, post_id, liked))
+        added, removed, rejected = [], [], []
+        for index, items in by_shard.items():
+            conn = self.connect(index)
+            try:
+                for user_id, post_id, liked in items:
+                    if liked:
+                        if self.find_post_shard(post_id) is None:
+                            rejected.append((user_id, post_id))
+                            continue
+                        try:
+                            cursor = conn.execute("""
+                            INSERT INTO likes (id, user_id, post_id) VALUES (?, ?, ?)
+                            ON CONFLICT (user_id, post_id) DO NOTHING
+                            """, (self.next_id("likes"), user_id, post_id))
+                        except sqlite3.IntegrityError:
+                            rejected.append((user_id, post_id))
+                            continue
+                        if cursor.rowcount > 0:
+                            added.append((user_id, post_id))
+                    else:
+                        cursor = conn.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?",
+                                              (user_id, post_id))
+                        if cursor.rowcount > 0:
+                            removed.append((user_id, post_id))
+                conn.commit()
+            finally:
+                conn.close()
+        return added, removed, rejected
+
+    def apply_writes(self, ops):
+        # Group commit bramki zapisów: jedna transakcja na shard, każda
+        # operacja we własnym SAVEPOINT. Zwraca (wyniki per operacja,
+        # [(operacja, błąd)]).
+        # ops: [("comment", (user_id, post_id, content)), ("like"/"unlike", (user_id, post_id))]
+        results = [False] * len(ops)
+        errors = []
+        by_shard = {}
+        for position, (op, args) in enumerate(ops):
+            try:
+                by_shard.setdefault(self.shard_for(int(args[0])), []).append(position)
+            except (TypeError, ValueError, IndexError) as e:
+                errors.append((op, e))
+        for index, positions in by_shard.items():
+            conn = self.connect(index)
+            done = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for position in positions:
+                    op, args = ops[position]
+                    conn.execute("SAVEPOINT write_op")
+                    try:
+                        user_id, post_id = int(args[0]), int(args[1])
+                        if op in ("comment", "like") and self.find_post_shard(post_id) is None:
+                            raise ValueError(f"Post o ID {post_id} nie istnieje!")
+                        if op == "comment":
+                            self._require_user(conn, user_id)
+                            conn.execute("INSERT INTO comments (id, user_id, post_id, content) VALUES (?, ?, ?, ?)",
+                                         (self.next_id("comments"), user_id, post_id, args[2]))
+                            changed = True
+                        elif op == "like":
+                            changed = conn.execute("""
+                            INSERT INTO likes (id, user_id, post_id) VALUES (?, ?, ?)
+                            ON CONFLICT (user_id, post_id) DO NOTHING
+                            """, (self.next_id("likes"), user_id, post_id)).rowcount > 0
+                        elif op == "unlike":
+                            changed = conn.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?",
+                                                   (user_id, post_id)).rowcount > 0
+                        else:
+                            raise ValueError(f"Nieznana operacja: {op}")
+                        conn.execute("RELEASE write_op")
+                        done.append((position, changed))
+                    except (sqlite3.IntegrityError, ValueError, TypeError, IndexError) as e:
+                        conn.execute("ROLLBACK TO write_op")
+                        conn.execute("RELEASE write_op")
+                        errors.append((op, e))
+                conn.commit()
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                errors.extend((ops[position][0], e) for position in positions)
+                done = []
+            finally:
+                conn.close()
+            for position, changed in done:
+                results[position] = changed
+        return results, errors
+
+    def has_liked(self, user_id, post_ids):
+        post_ids = list({int(post_id) for post_id in post_ids})
+        liked = set()
+        conn = self.connect(self.shard_for(user_id))
+        for start in range(0, len(post_ids), 998):
+            chunk = post_ids[start:start + 998]
+            placeholders = ", ".join("?" for _ in chunk)
+            liked.update(row["post_id"] for row in conn.execute(f"""
+            SELECT post_id FROM likes
+            WHERE user_id = ? AND post_id IN ({placeholders})
+            """, [user_id, *chunk]))
+        conn.close()
+        return liked
+
+    # --- odczyty ---
+
+    def post_details(self, post_ids):
+        post_ids = list(set(post_ids))
+        contents = {}
+        for start in range(0, len(post_ids), 999):
+            chunk = post_ids[start:start + 999]
+            placeholders = ", ".join("?" for _ in chunk)
+            for rows in self._scatter(f"""
+            SELECT posts.id, posts.content, users.username FROM posts
+            JOIN users ON posts.user_id = users.id
+            WHERE posts.id IN ({placeholders})
+            """, chunk):
+                contents.update((row["id"], row) for row in rows)
+        return contents
+
+    def usernames(self, user_ids):
+        by_shard = {}
+        for user_id in set(user_ids):
+            by_shard.setdefault(self.shard_for(user_id), []).append(int(user_id))
+        names = {}
+        for index, ids in by_shard.items():
+            conn = self.connect(index)
+            for start in range(0, len(ids), 999):
+                chunk = ids[start:start + 999]
+                placeholders = ", ".join("?" for _ in chunk)
+                names.update((row["id"], row["username"]) for row in conn.execute(
+                    f"SELECT id, username FROM users WHERE id IN ({placeholders})", chunk))
+            conn.close()
+        return names
+
+    def iter_users(self):
+        for row in heapq.merge(*self._scatter("SELECT id, username, email, created_at FROM users ORDER BY id"),
+                               key=lambda row: row["id"]):
+            yield tuple(row)
+
+    def iter_posts(self):
+        for row in heapq.merge(*self._scatter("""
+        SELECT posts.id, users.username, posts.content, posts.created_at
+        FROM posts
+        JOIN users ON posts.user_id = users.id
+        ORDER BY posts.created_at DESC
+        """), key=lambda row: row["created_at"], reverse=True):
+            yield tuple(row)
+
+    def recent_posts(self, limit):
+        # Najnowsze `limit` postów: top-N z każdego shardu i scalenie
+        rows = heapq.merge(*self._scatter("""
+        SELECT posts.id, users.username, posts.content, posts.created_at
+        FROM posts
+        JOIN users ON posts.user_id = users.id
+        ORDER BY posts.created_at DESC, posts.id DESC
+        LIMIT ?
+        """, (limit,)), key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        return [tuple(row) for row in islice(rows, limit)]
+
+    def _iter_with_post_content(self, query):
+        rows = list(heapq.merge(*self._scatter(query), key=lambda row: row["created_at"], reverse=True))
+        contents = self.post_details(row["post_id"] for row in rows)
+        for row in rows:
+            post = contents.get(row["post_id"])
+            if post is not None:
+                yield (row["id"], row["username"], post["content"], *tuple(row)[3:])
+
+    def iter_comments(self):
+        return self._iter_with_post_content("""
+        SELECT c.id, u.username, c.post_id, c.content, c.created_at
+        FROM comments c
+        JOIN users u ON c.user_id = u.id
+        ORDER BY c.created_at DESC
+        """)
+
+    def iter_likes(self):
+        return self._iter_with_post_content("""
+        SELECT likes.id, users.username, likes.post_id, likes.created_at
+        FROM likes
+        JOIN users ON likes.user_id = users.id
+        ORDER BY likes.created_at DESC
+        """)
+
+    def get_user_posts(self, user_id):
+        conn = self.connect(self.shard_for(user_id))
+        posts = conn.execute("""
+        SELECT posts.id, posts.content, posts.created_at
+        FROM posts
+        WHERE posts.user_id = ?
+        ORDER BY posts.created_at DESC
+        """, (user_id,)).fetchall()
+        conn.close()
+        return posts
+
+    def get_post_comments(self, post_id):
+        return list(heapq.merge(*self._scatter("""
+        SELECT c.id, u.username, c.content, c.created_at
+        FROM comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.post_id = ?
+        ORDER BY c.created_at DESC
+        """, (post_id,)), key=lambda row: row["created_at"], reverse=True))
+
+    def get_post_likes(self, post_id):
+        return sum(rows[0][0] for rows in self._scatter(
+            "SELECT COALESCE(SUM(like_count), 0) FROM post_stats WHERE post_id = ?", (post_id,)))
+
+    def get_user_posts_many(self, user_ids):
+        by_shard = {}
+        for user_id in dict.fromkeys(int(user_id) for user_id in user_ids):
+            by_shard.setdefault(self.shard_for(user_id), []).append(user_id)
+        grouped = {user_id: [] for ids in by_shard.values() for user_id in ids}
+        for index, ids in by_shard.items():
+            conn = self.connect(index)
+            for start in range(0, len(ids), 999):
+                chunk = ids[start:start + 999]
+                placeholders = ", ".join("?" for _ in chunk)
+                for row in conn.execute(f"""
+                SELECT posts.user_id, posts.id, posts.content, posts.created_at
+                FROM posts
+                WHERE posts.user_id IN ({placeholders})
+                ORDER BY posts.created_at DESC
+                """, chunk):
+                    grouped[row["user_id"]].append(row)
+            conn.close()
+        return grouped
+
+    def get_post_comments_many(self, post_ids):
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in post_ids))
+        grouped = {post_id: [] for post_id in post_ids}
+        for start in range(0, len(post_ids), 999):
+            chunk = post_ids[start:start + 999]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in heapq.merge(*self._scatter(f"""
+            SELECT c.post_id, c.id, u.username, c.content, c.created_at
+            FROM comments c
+            JOIN users u ON c.user_id = u.id
+            WHERE c.post_id IN ({placeholders})
+            ORDER BY c.created_at DESC
+            """, chunk), key=lambda row: row["created_at"], reverse=True):
+                grouped[row["post_id"]].append(row)
+        return grouped
+
+    def get_post_like_counts(self, post_ids):
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in post_ids))
+        counts = Counter(dict.fromkeys(post_ids, 0))
+        for start in range(0, len(post_ids), 999):
+            chunk = post_ids[start:start + 999]
+            placeholders = ", ".join("?" for _ in chunk)
+            for rows in self._scatter(f"""
+            SELECT post_id, like_count FROM post_stats
+            WHERE post_id IN ({placeholders})
+            """, chunk):
+                counts.update({row[0]: row[1] for row in rows})
+        return dict(counts)
+
+    # Rankingi z całego okresu czytają liczniki user_stats/post_stats shardów.
+    # Opcjonalne `since` (tekst porównywany z created_at) daje rankingi
+    # okienkowe liczone wprost z wierszy, bez rollupów.
+
+    def get_user_post_counts(self, limit=-1, since=None):
+        # Posty leżą na shardzie autora, więc top-N z każdego shardu wystarcza
+        if since is None:
+            query, params = """
+            SELECT users.id, users.username, s.post_count
+            FROM user_stats s
+            JOIN users ON s.user_id = users.id
+            ORDER BY s.post_count DESC, s.user_id
+            LIMIT ?
+            """, (limit,)
+        else:
+            query, params = """
+            SELECT users.id, users.username, COUNT(*) AS post_count
+            FROM users
+            JOIN posts ON posts.user_id = users.id AND posts.created_at >= ?
+            GROUP BY users.id
+            ORDER BY post_count DESC, users.id
+            LIMIT ?
+            """, (since, limit)
+        ranked = heapq.merge(*self._scatter(query, params), key=lambda row: (-row["post_count"], row["id"]))
+        ranked = islice(ranked, limit if limit >= 0 else None)
+        return [{"username": row["username"], "post_count": row["post_count"]} for row in ranked]
+
+    def get_top_likers(self, limit=-1, since=None):
+        if since is None:
+            query, params = """
+            SELECT users.id, users.username, s.like_count
+            FROM user_stats s
+            JOIN users ON s.user_id = users.id
+            WHERE s.like_count > 0
+            ORDER BY s.like_count DESC, s.user_id
+            LIMIT ?
+            """, (limit,)
+        else:
+            query, params = """
+            SELECT users.id, users.username, COUNT(*) AS like_count
+            FROM likes
+            JOIN users ON likes.user_id = users.id
+            WHERE likes.created_at >= ?
+            GROUP BY users.id
+            ORDER BY like_count DESC, users.id
+            LIMIT ?
+            """, (since, limit)
+        ranked = heapq.merge(*self._scatter(query, params), key=lambda row: (-row["like_count"], row["id"]))
+        ranked = islice(ranked, limit if limit >= 0 else None)
+        return [{"username": row["username"], "like_count": row["like_count"]} for row in ranked]
+
+    def get_most_commented_posts(self, limit=-1, since=None):
+        # Komentarze do jednego postu są rozrzucone po shardach autorów -
+        # liczniki częściowe trzeba zsumować przed wyborem top-N.
+        if since is None:
+            query, params = "SELECT post_id, comment_count FROM post_stats WHERE comment_count > 0", ()
+        else:
+            query, params = """
+            SELECT post_id, COUNT(*) FROM comments
+            WHERE created_at >= ?
+            GROUP BY post_id
+            """, (since,)
+        counts = Counter()
+        for rows in self._scatter(query, params):
+            counts.update({row[0]: row[1] for row in rows})
+        contents = self.post_details(counts)
+        ranked = sorted((item for item in counts.items() if item[0] in contents),
+                        key=lambda item: (-item[1], item[0]))
+        if limit >= 0:
+            ranked = ranked[:limit]
+        return [{"id": post_id, "content": contents[post_id]["content"],
+                 "username": contents[post_id]["username"], "comment_count": count}
+                for post_id, count in ranked]
+
+    def table_versions(self, *tables):
+        placeholders = ", ".join("?" for _ in tables)
+        versions = Counter()
+        for rows in self._scatter(f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})", tables):
+            versions.update({row["name"]: row["version"] for row in rows})
+        return tuple(versions[table] for table in tables)
+
+    def status(self):
+        counts = [dict(zip(SHARD_TABLES, rows[0])) for rows in self._scatter(
+            "SELECT " + ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in SHARD_TABLES))]
+        return {"shard_count": self.shard_count, "shards": counts}
+
+    # --- porządki (akcje z /management) ---
+
+    def delete_inactive_users(self):
+        # Posty leżą na shardzie autora, więc "bez postów" sprawdzamy lokalnie;
+        # komentarze i polubienia usuwanych użytkowników znikają kaskadowo
+        deleted = []
+        for index in range(self.shard_count):
+            conn = self.connect(index)
+            try:
+                deleted += [row[0] for row in conn.execute("""
+                DELETE FROM users WHERE id NOT IN (SELECT DISTINCT user_id FROM posts)
+                RETURNING id
+                """).fetchall()]
+                conn.commit()
+            finally:
+                conn.close()
+        meta = self._connect_path(self.meta_path)
+        for start in range(0, len(deleted), 999):
+            chunk = deleted[start:start + 999]
+            meta.execute(f"DELETE FROM directory WHERE user_id IN ({', '.join('?' for _ in chunk)})", chunk)
+        meta.commit()
+        meta.close()
+        return len(deleted)
+
+    def delete_old_posts(self, modifier="-30 days"):
+        # Komentarze i polubienia z innych shardów zostają osierocone -
+        # usuwa je delete_orphans
+        deleted = 0
+        for index in range(self.shard_count):
+            conn = self.connect(index)
+            try:
+                deleted += conn.execute("DELETE FROM posts WHERE created_at < DATETIME('now', ?)",
+                                        (modifier,)).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        self._post_shards.clear()
+        return deleted
+
+    def delete_orphans(self, table):
+        # table: "comments" albo "likes" - wiersze wskazujące na posty, których
+        # nie ma na żadnym shardzie
+        referenced = set()
+        for rows in self._scatter(f"SELECT DISTINCT post_id FROM {table}"):
+            referenced.update(row[0] for row in rows)
+        existing = self.post_details(referenced)
+        missing = [post_id for post_id in referenced if post_id not in existing]
+        deleted = 0
+        for index in range(self.shard_count):
+            conn = self.connect(index)
+            try:
+                for start in range(0, len(missing), 999):
+                    chunk = missing[start:start + 999]
+                    deleted += conn.execute(f"""
+                    DELETE FROM {table} WHERE post_id IN ({", ".join("?" for _ in chunk)})
+                    """, chunk).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        return deleted
+
+    # --- migracja i rebalansowanie ---
+
+    def _copy_shard_rows(self, conn, source, condition, params):
+        # Kopia wierszy użytkowników spełniających warunek z dołączonej bazy
+        # `source`; INSERT OR IGNORE - ponowne uruchomienie niczego nie dubluje.
+        conn.execute("ATTACH DATABASE ? AS src", (source,))
+        conn.execute(f"""
+        INSERT OR IGNORE INTO users (id, username, email, created_at)
+        SELECT id, username, email, created_at FROM src.users WHERE {condition.format(column="id")}
+        """, params)
+        for table, columns in (("posts", "id, user_id, content, created_at"),
+                               ("comments", "id, user_id, post_id, content, created_at"),
+                               ("likes", "id, user_id, post_id, created_at")):
+            conn.execute(f"""
+            INSERT OR IGNORE INTO {table} ({columns})
+            SELECT {columns} FROM src.{table}
+            WHERE user_id IN (SELECT id FROM src.users WHERE {condition.format(column="id")})
+            """, params)
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+
+    def import_database(self, path):
+        # Jednorazowe przeniesienie danych z pojedynczego pliku (id bez zmian)
+        source = sqlite3.connect(path)
+        users = source.execute("SELECT id, username, email FROM users").fetchall()
+        max_ids = {table: source.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                   for table in SHARD_TABLES}
+        source.close()
+        meta = self._connect_path(self.meta_path)
+        for table, max_id in max_ids.items():
+            meta.execute("""
+            INSERT INTO sequences (name, next_id) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET next_id = MAX(next_id, excluded.next_id)
+            """, (table, max_id + 1))
+        meta.executemany("INSERT OR IGNORE INTO directory (user_id, username, email) VALUES (?, ?, ?)", users)
+        meta.commit()
+        meta.close()
+        with self._id_lock:
+            self._id_blocks.clear()
+        for index in range(self.shard_count):
+            conn = self.connect(index)
+            self._copy_shard_rows(conn, path, "{column} % ? = ?", (self.shard_count, index))
+            conn.close()
+        return len(users)
+
+    def rebalance(self, new_count):
+        # Przenosi każdego użytkownika (z jego postami, komentarzami
+        # i polubieniami) na shard user_id % new_count: najpierw kopia na
+        # shard docelowy, potem usunięcie ze źródła (kaskadowo), więc
+        # przerwane rebalansowanie wystarczy uruchomić ponownie.
+        # Uruchamiać przy zatrzymanej aplikacji.
+        old_indexes = sorted(int(os.path.basename(path)[len("shard-"):-len(".sqlite")])
+                             for path in glob.glob(os.path.join(self.directory, "shard-*.sqlite")))
+        self._ensure_shards(new_count)
+        moved = 0
+        for index in old_indexes:
+            for target in range(new_count):
+                if target != index:
+                    conn = self.connect(target)
+                    self._copy_shard_rows(conn, self.shard_path(index), "{column} % ? = ?", (new_count, target))
+                    conn.close()
+            conn = self.connect(index)
+            moved += conn.execute("DELETE FROM users WHERE id % ? != ?", (new_count, index)).rowcount
+            conn.commit()
+            conn.close()
+        meta = self._connect_path(self.meta_path)
+        meta.execute("UPDATE settings SET value = ? WHERE name = 'shard_count'", (new_count,))
+        meta.commit()
+        meta.close()
+        for index in old_indexes:
+            if index >= new_count:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(self.shard_path(index) + suffix):
+                        os.remove(self.shard_path(index) + suffix)
+        self.shard_count = new_count
+        self._post_shards.clear()
+        self._pool.shutdown()
+        self._pool = ThreadPoolExecutor(max_workers=min(new_count, 8))
+        return moved
+
+def main():
+    parser = argparse.ArgumentParser(description="Narzędzia backendu shardowanego")
+    parser.add_argument("--dir", default="shards", help="Katalog z plikami shardów")
+    parser.add_argument("--shards", type=int, default=4, help="Liczba shardów dla nowego katalogu")
+    parser.add_argument("--status", action="store_true", help="Pokaż liczbę wierszy na shardach")
+    parser.add_argument("--import", dest="import_path", help="Zaimportuj dane z pojedynczej bazy SQLite")
+    parser.add_argument("--rebalance", type=int, metavar="N", help="Rozłóż dane na N shardów")
+    args = parser.parse_args()
+
+    store = ShardedStore(args.dir, args.shards)
+    if args.import_path:
+        print(f"📥 Zaimportowano {store.import_database(args.import_path)} użytkowników z {args.import_path}.")
+    if args.rebalance:
+        print(f"🔀 Przeniesiono {store.rebalance(args.rebalance)} użytkowników, shardów: {args.rebalance}.")
+    if args.status or not (args.import_path or args.rebalance):
+        status = store.status()
+        print(f"Shardów: {status['shard_count']}")
+        for index, counts in enumerate(status["shards"]):
+            print(f"  shard-{index}: " + ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
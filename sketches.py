@@ -0,0 +1,266 @@
+# sketches.py
+# Struktury probabilistyczne dla przybliżonej analityki. Każda struktura ma
+# stały rozmiar pamięci, niezależny od liczby przetworzonych zdarzeń.
+#
+# Gwarancje błędu (N = liczba zdarzeń dodanych do danej struktury):
+# - CountMinSketch(width=w, depth=d): estymata nigdy nie jest mniejsza od
+#   prawdziwej wartości, a z prawdopodobieństwem >= 1 - e^(-d) przekracza ją
+#   o co najwyżej (e / w) * N. Domyślnie w=2719, d=5: błąd <= 0.1% * N
+#   z prawdopodobieństwem >= 99%.
+# - HeavyHitters(k): śledzi k kandydatów o największych estymatach CMS; każdy
+#   element o częstości > N / k i estymacie powyżej progu zostaje wykryty,
+#   a zwracane liczniki mają błąd CMS opisany wyżej.
+# - HyperLogLog(p): 2^p rejestrów po 1 bajcie, względny błąd standardowy
+#   ~1.04 / sqrt(2^p) (p=10: ~3.3%, p=14: ~0.8%).
+# - ReservoirSample(size): jednostajna próbka `size` elementów ze strumienia
+#   (algorytm R) - każdy element trafia do próbki z prawd. size / N.
+import base64
+import hashlib
+import math
+import random
+from array import array
+from collections import OrderedDict
+
+def _hash64(item, salt=b""):
+    digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8, salt=salt).digest()
+    return int.from_bytes(digest, "big")
+
+class HyperLogLog:
+    def __init__(self, p=10, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, item):
+        h = _hash64(item)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def state(self):
+        return {"p": self.p, "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["p"], base64.b64decode(state["registers"]))
+
+class CountMinSketch:
+    def __init__(self, width=2719, depth=5, counts=None, total=0):
+        self.width = width
+        self.depth = depth
+        self.total = total
+        self.counts = array("q", counts) if counts is not None else array("q", bytes(8 * width * depth))
+
+    @classmethod
+    def from_error(cls, epsilon=0.001, delta=0.01):
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    def _cells(self, item):
+        h1 = _hash64(item)
+        h2 = _hash64(item, b"cms") | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, item, count=1):
+        self.total += count
+        estimate = None
+        for cell in self._cells(item):
+            self.counts[cell] += count
+            value = self.counts[cell]
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, item):
+        return min(self.counts[cell] for cell in self._cells(item))
+
+    def merge(self, other):
+        # Szkice o tych samych wymiarach sumują się komórka po komórce
+        for cell, count in enumerate(other.counts):
+            if count:
+                self.counts[cell] += count
+        self.total += other.total
+
+    def error_bound(self):
+        return math.e / self.width * self.total
+
+    def state(self):
+        return {"width": self.width, "depth": self.depth, "total": self.total,
+                "counts": base64.b64encode(self.counts.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_state(cls, state):
+        counts = array("q")
+        counts.frombytes(base64.b64decode(state["counts"]))
+        return cls(state["width"], state["depth"], counts, state["total"])
+
+class HeavyHitters:
+    def __init__(self, k=50, sketch=None, candidates=None):
+        self.k = k
+        self.sketch = sketch or CountMinSketch()
+        self.candidates = dict(candidates or {})
+
+    def add(self, item, count=1):
+        estimate = self.sketch.add(item, count)
+        if item in self.candidates or len(self.candidates) < self.k:
+            self.candidates[item] = estimate
+            return
+        weakest = min(self.candidates, key=self.candidates.get)
+        if estimate > self.candidates[weakest]:
+            del self.candidates[weakest]
+            self.candidates[item] = estimate
+
+    def merge(self, other):
+        # Kandydaci obu stron z estymatami ze scalonego szkicu, k najsilniejszych
+        self.sketch.merge(other.sketch)
+        items = set(self.candidates) | set(other.candidates)
+        ranked = sorted(((self.sketch.estimate(item), item) for item in items), reverse=True)
+        self.candidates = {item: estimate for estimate, item in ranked[:self.k]}
+
+    def top(self, n):
+        ranked = sorted(self.candidates.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked[:n]
+
+    def state(self):
+        return {"k": self.k, "sketch": self.sketch.state(),
+                "candidates": [[item, count] for item, count in self.candidates.items()]}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["k"], CountMinSketch.from_state(state["sketch"]),
+                   {item: count for item, count in state["candidates"]})
+
+class ReservoirSample:
+    def __init__(self, size=100, items=None, seen=0):
+        self.size = size
+        self.items = list(items or [])
+        self.seen = seen
+        self._rng = random.Random()
+
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        slot = self._rng.randrange(self.seen)
+        if slot < self.size:
+            self.items[slot] = item
+
+    def merge(self, other):
+        # Każde miejsce próbki bierze element ze strumienia z prawdopodobieństwem
+        # proporcjonalnym do liczby elementów, które ten strumień widział
+        mine, theirs = self.items[:], other.items[:]
+        self._rng.shuffle(mine)
+        self._rng.shuffle(theirs)
+        weight_mine, weight_theirs = self.seen, other.seen
+        items = []
+        while len(items) < self.size and (mine or theirs):
+            if theirs and (not mine or self._rng.random() * (weight_mine + weight_theirs) >= weight_mine):
+                items.append(theirs.pop())
+            else:
+                items.append(mine.pop())
+        self.items = items
+        self.seen += other.seen
+
+    def state(self):
+        return {"size": self.size, "items": self.items, "seen": self.seen}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["size"], state["items"], state["seen"])
+
+class ApproximateAnalytics:
+    # Komplet szkiców utrzymywanych na ścieżce zapisu. HLL-e "distinct likers"
+    # są trzymane tylko dla ostatnio aktywnych postów (LRU), więc pamięć
+    # pozostaje stała niezależnie od liczby postów.
+    def __init__(self, top_k=50, tracked_posts=256, hll_precision=10, sample_size=100):
+        self.liked_posts = HeavyHitters(top_k)
+        self.commented_posts = HeavyHitters(top_k)
+        self.likers = HeavyHitters(top_k)
+        self.all_likers = HyperLogLog(14)
+        self.post_likers = OrderedDict()
+        self.tracked_posts = tracked_posts
+        self.hll_precision = hll_precision
+        self.log_sample = ReservoirSample(sample_size)
+
+    def record_like(self, user_id, post_id):
+        self.liked_posts.add(post_id)
+        self.likers.add(user_id)
+        self.all_likers.add(user_id)
+        hll = self.post_likers.pop(post_id, None) or HyperLogLog(self.hll_precision)
+        hll.add(user_id)
+        self.post_likers[post_id] = hll
+        if len(self.post_likers) > self.tracked_posts:
+            self.post_likers.popitem(last=False)
+
+    def record_unlike(self, user_id, post_id):
+        # Count-Min w modelu "turnstile": prawdziwe liczniki nie spadają poniżej
+        # zera, więc estymata min() nadal jest ograniczeniem górnym. HLL nie
+        # obsługuje usuwania - liczba unikalnych lajkujących może być zawyżona.
+        self.liked_posts.add(post_id, -1)
+        self.likers.add(user_id, -1)
+
+    def record_comment(self, user_id, post_id):
+        self.commented_posts.add(post_id)
+
+    def record_log(self, entry):
+        self.log_sample.add(entry)
+
+    def merge(self, other):
+        self.liked_posts.merge(other.liked_posts)
+        self.commented_posts.merge(other.commented_posts)
+        self.likers.merge(other.likers)
+        self.all_likers.merge(other.all_likers)
+        for post_id, hll in other.post_likers.items():
+            mine = self.post_likers.pop(post_id, None)
+            if mine is not None:
+                mine.merge(hll)
+                hll = mine
+            else:
+                hll = HyperLogLog.from_state(hll.state())
+            self.post_likers[post_id] = hll
+        while len(self.post_likers) > self.tracked_posts:
+            self.post_likers.popitem(last=False)
+        self.log_sample.merge(other.log_sample)
+        return self
+
+    def distinct_likers(self, post_id):
+        hll = self.post_likers.get(post_id)
+        return hll.count() if hll is not None else None
+
+    def state(self):
+        return {
+            "liked_posts": self.liked_posts.state(),
+            "commented_posts": self.commented_posts.state(),
+            "likers": self.likers.state(),
+            "all_likers": self.all_likers.state(),
+            "post_likers": [[post_id, hll.state()] for post_id, hll in self.post_likers.items()],
+            "tracked_posts": self.tracked_posts,
+            "hll_precision": self.hll_precision,
+            "log_sample": self.log_sample.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        approx = cls(tracked_posts=state["tracked_posts"], hll_precision=state["hll_precision"])
+        approx.liked_posts = HeavyHitters.from_state(state["liked_posts"])
+        approx.commented_posts = HeavyHitters.from_state(state["commented_posts"])
+        approx.likers = HeavyHitters.from_state(state["likers"])
+        approx.all_likers = HyperLogLog.from_state(state["all_likers"])
+        approx.post_likers = OrderedDict(
+            (post_id, HyperLogLog.from_state(hll)) for post_id, hll in state["post_likers"])
+        approx.log_sample = ReservoirSample.from_state(state["log_sample"])
+        return approx